@@ -11,6 +11,8 @@ from .types import (
 
 from .workflow_template import (
     get_workflow_template,
+    WORKFLOW_TEMPLATE_BYTES,
+    LOADER_NODE_IDS,
     INPUT_IMAGE_PLACEHOLDER,
     PROMPT_PLACEHOLDER,
     SEED_PLACEHOLDER,
@@ -23,7 +25,10 @@ from .workflow_template import (
 
 from .workflow_executor import (
     inject_workflow_parameters,
+    render_workflow_bytes,
     create_workflow,
+    create_batch_workflow,
+    batch_node_id,
     save_workflow_to_file,
     load_workflow_from_file,
     validate_workflow_parameters,
@@ -39,6 +44,8 @@ __all__ = [
     "ErrorResponse",
     # Workflow template
     "get_workflow_template",
+    "WORKFLOW_TEMPLATE_BYTES",
+    "LOADER_NODE_IDS",
     "INPUT_IMAGE_PLACEHOLDER",
     "PROMPT_PLACEHOLDER",
     "SEED_PLACEHOLDER",
@@ -49,7 +56,10 @@ __all__ = [
     "DEFAULT_CFG",
     # Workflow executor
     "inject_workflow_parameters",
+    "render_workflow_bytes",
     "create_workflow",
+    "create_batch_workflow",
+    "batch_node_id",
     "save_workflow_to_file",
     "load_workflow_from_file",
     "validate_workflow_parameters",
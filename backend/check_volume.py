@@ -5,12 +5,16 @@ import modal
 
 app = modal.App("check-volume")
 vol = modal.Volume.from_name("qwen-models")
+# check_model_files is shared with the local download script
+image = modal.Image.debian_slim(python_version="3.11").add_local_python_source("model_download")
 
-@app.function(volumes={"/cache": vol})
+@app.function(image=image, volumes={"/cache": vol})
 def check_models():
     """Check if models exist in volume"""
     from pathlib import Path
 
+    from model_download import check_model_files
+
     cache_dir = Path("/cache/models")
 
     print("=" * 60)
@@ -21,27 +25,20 @@ def check_models():
         print("ERROR: /cache/models directory does not exist!")
         return False
 
-    models = {
-        "vae": ["qwen_image_vae.safetensors"],
-        "clip": ["qwen_2.5_vl_7b.safetensors"],
-        "unet": ["Qwen-Image-Edit-2511.safetensors"],
-        "loras": [
-            "Qwen-Image-Lightning-4steps-V1.0.safetensors",
-            "Qwen-Image-Lightning-8steps-V1.0.safetensors",
-        ],
-    }
-
+    # Every file is scanned; the download manifest only catches truncated files
     all_exist = True
-    for model_type, model_files in models.items():
+    for model_type, model_files in check_model_files(cache_dir).items():
         print(f"\n{model_type}:")
-        for model_file in model_files:
-            file_path = cache_dir / model_type / model_file
-            if file_path.exists():
-                size_mb = file_path.stat().st_size / (1024 * 1024)
-                print(f"  OK: {model_file} ({size_mb:.1f} MB)")
-            else:
+        for model_file, (size, expected) in model_files.items():
+            if size is None:
                 print(f"  MISSING: {model_file}")
                 all_exist = False
+            elif expected is not None and size != expected:
+                print(f"  TRUNCATED: {model_file} ({size / (1024 * 1024):.1f} MB, "
+                      f"expected {expected / (1024 * 1024):.1f} MB)")
+                all_exist = False
+            else:
+                print(f"  OK: {model_file} ({size / (1024 * 1024):.1f} MB)")
 
     print("\n" + "=" * 60)
     if all_exist:
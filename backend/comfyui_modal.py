@@ -18,12 +18,24 @@ Requirements:
 """
 
 import modal
+import base64
+import hashlib
+import json
 import subprocess
 import os
+import random
 import shutil
+import sys
+import time
+import uuid
 import logging
+import math
+import re
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional
+from types import MappingProxyType
+from typing import List, Optional, Tuple, Union
 
 # 配置日志
 logging.basicConfig(
@@ -41,22 +53,172 @@ app = modal.App("qwen-image-edit")
 # 模型缓存卷 - 避免重复下载模型 (Requirement 5.4)
 vol = modal.Volume.from_name("qwen-models", create_if_missing=True)
 
+# ============================================================================
+# 模型路径配置
+# ============================================================================
+
+COMFYUI_ROOT = Path("/root/comfy/ComfyUI")
+CACHE_ROOT = Path("/cache")
+
+# ComfyUI input 目录中保留的输入图片数量（按最近使用顺序清理）
+MAX_CACHED_INPUT_IMAGES = 32
+
+# 模型目录映射：缓存目录 -> ComfyUI 目录
+MODEL_PATHS = {
+    "vae": {
+        "cache": CACHE_ROOT / "models" / "vae",
+        "comfyui": COMFYUI_ROOT / "models" / "vae",
+    },
+    "clip": {
+        "cache": CACHE_ROOT / "models" / "clip",
+        "comfyui": COMFYUI_ROOT / "models" / "clip",
+    },
+    "unet": {
+        "cache": CACHE_ROOT / "models" / "unet",
+        "comfyui": COMFYUI_ROOT / "models" / "diffusion_models",  # ComfyUI 使用 diffusion_models 目录
+    },
+    "loras": {
+        "cache": CACHE_ROOT / "models" / "loras",
+        "comfyui": COMFYUI_ROOT / "models" / "loras",
+    },
+}
+
+# 模型文件列表 (Requirements 5.6, 5.7)
+MODELS = {
+    "vae": ["qwen_image_vae.safetensors"],
+    "clip": ["qwen_2.5_vl_7b.safetensors"],
+    "unet": ["Qwen-Image-Edit-2511.safetensors"],
+    "loras": [
+        "Qwen-Image-Lightning-4steps-V1.0.safetensors",
+        "Qwen-Image-Lightning-8steps-V1.0.safetensors",
+    ],
+}
+
 # ============================================================================
 # Docker 镜像配置
 # ============================================================================
 
+# 只量化 transformer block 内的线性层权重；img_in/txt_in/proj_out、时间嵌入和
+# norm_out 等输入输出投影对量化误差最敏感，保持原精度
+_FP8_WEIGHT_PATTERN = re.compile(r"(?:^|\.)transformer_blocks\.\d+\..+\.weight$")
+
+# safetensors dtype 字符串 -> 每个元素的字节数
+_SAFETENSORS_DTYPE_SIZES = {
+    "BOOL": 1, "U8": 1, "I8": 1, "F8_E4M3": 1, "F8_E5M2": 1,
+    "U16": 2, "I16": 2, "F16": 2, "BF16": 2,
+    "U32": 4, "I32": 4, "F32": 4,
+    "U64": 8, "I64": 8, "F64": 8,
+}
+
+
+def _quantize_fp8(src_path: Path, dst_path: Path) -> None:
+    """
+    将 bf16 UNet 转换为 ComfyUI 的 scaled fp8 (e4m3) 格式
+    
+    transformer block 中的二维线性层权重按张量缩放到 e4m3 范围，附带
+    <layer>.scale_weight，并写入 scaled_fp8 标记让 ComfyUI 加载时反缩放；
+    输入/输出投影、norm、bias 等其他张量按原字节复制。
+    
+    张量按数据偏移顺序逐个读取并直接写入目标文件（先写 .part 再原子替换），
+    内存中同时只保留一个张量，不必把约 40GB 的 bf16 state dict 整个读入内存。
+    
+    Args:
+        src_path: 源 safetensors 文件
+        dst_path: 目标 safetensors 文件
+    """
+    import torch
+    
+    float_dtypes = {"BF16": torch.bfloat16, "F16": torch.float16, "F32": torch.float32}
+    fp8_max = torch.finfo(torch.float8_e4m3fn).max
+    
+    with open(src_path, "rb") as src:
+        header_size = int.from_bytes(src.read(8), "little")
+        src_header = json.loads(src.read(header_size))
+        data_start = 8 + header_size
+        metadata = src_header.pop("__metadata__", None) or {}
+        names = sorted(src_header, key=lambda name: src_header[name]["data_offsets"][0])
+        quantized = {
+            name for name in names
+            if _FP8_WEIGHT_PATTERN.search(name)
+            and len(src_header[name]["shape"]) == 2
+            and math.prod(src_header[name]["shape"]) > 0
+            and src_header[name]["dtype"] in float_dtypes
+        }
+        
+        # 先根据源文件头算出目标文件头，数据部分再按同样的顺序写出
+        entries = []
+        for name in names:
+            info = src_header[name]
+            if name in quantized:
+                entries.append((name, "F8_E4M3", info["shape"]))
+                entries.append((name[: -len("weight")] + "scale_weight", "F32", [1]))
+            else:
+                entries.append((name, info["dtype"], info["shape"]))
+        entries.append(("scaled_fp8", "F8_E4M3", [0]))
+        
+        header = {"__metadata__": {**metadata, "dtype": "fp8_e4m3"}}
+        offset = 0
+        for name, dtype, shape in entries:
+            end = offset + math.prod(shape) * _SAFETENSORS_DTYPE_SIZES[dtype]
+            header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [offset, end]}
+            offset = end
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        # 与 safetensors 一致：文件头用空格补齐到 8 字节对齐
+        header_bytes += b" " * (-len(header_bytes) % 8)
+        
+        part_path = dst_path.with_name(f"{dst_path.name}.part")
+        with open(part_path, "wb") as dst:
+            dst.write(len(header_bytes).to_bytes(8, "little"))
+            dst.write(header_bytes)
+            for name in names:
+                info = src_header[name]
+                begin, end = info["data_offsets"]
+                src.seek(data_start + begin)
+                data = src.read(end - begin)
+                if name not in quantized:
+                    dst.write(data)
+                    continue
+                tensor = torch.frombuffer(bytearray(data), dtype=float_dtypes[info["dtype"]]).float()
+                scale = tensor.abs().max().clamp(min=1e-12) / fp8_max
+                dst.write((tensor / scale).to(torch.float8_e4m3fn).view(torch.uint8).numpy().tobytes())
+                dst.write(scale.reshape(1).numpy().tobytes())
+    
+    os.replace(part_path, dst_path)
+
+
 # 模型下载函数 - 在镜像构建时执行
-def download_models():
+def download_models(cache_root: Path = CACHE_ROOT):
     """
     下载所有模型到缓存目录
     
     此函数在 Modal 镜像构建时执行，将模型下载到 /cache/models 目录。
-    """
-    from huggingface_hub import hf_hub_download
-    import os
-    from pathlib import Path
+    各模型文件通过线程池并行下载（网络 I/O 密集），并发数可通过
+    环境变量 HF_PARALLEL_DOWNLOADING_WORKERS 调整（默认 8）。
+    镜像中启用了 hf_transfer（HF_HUB_ENABLE_HF_TRANSFER=1），单个文件也会
+    拆分为多个分段并行下载；hf_transfer 失败时回退到默认下载器重试。
+    超过 1GB 的文件（如 UNet）直接使用镜像中的 aria2c 以 8 个连接下载。
+    bf16 的 UNet 下载后转换为 scaled fp8 (e4m3) 再保存，原始文件不保留。
+    其余文件下载到 /cache/hf 的 HuggingFace 缓存布局中，再在 /cache/models
+    下创建符号链接，省去重命名和清理空目录的额外 I/O。
     
-    cache_dir = Path("/cache/models")
+    此函数不提交卷，由调用方在全部下载完成后统一 commit 一次。
+    
+    Args:
+        cache_root: 缓存卷挂载点，默认 /cache
+    
+    Returns:
+        Dict[str, int]: 清单中的 "目录/文件名" -> 文件大小（字节）
+    """
+    from huggingface_hub import (
+        constants as hf_constants,
+        get_hf_file_metadata,
+        hf_hub_download,
+        hf_hub_url,
+    )
+
+    cache_dir = cache_root / "models"
+    # HuggingFace 标准缓存目录（同一个卷），小文件下载后从这里链接到 cache_dir
+    hf_cache_dir = cache_root / "hf"
     
     # 模型配置
     models = [
@@ -80,6 +242,8 @@ def download_models():
             "repo_id": "Comfy-Org/Qwen-Image-Edit_ComfyUI",
             "filename": "split_files/diffusion_models/qwen_image_edit_2511_bf16.safetensors",
             "local_dir": "unet",
+            # 下载后一次性转换为 fp8 e4m3，显存占用和加载带宽减半
+            "quantize": "fp8_e4m3fn",
         },
         # LoRA - 4 steps
         {
@@ -101,50 +265,123 @@ def download_models():
     print("📦 下载 Qwen-Image-Edit-2511 模型...")
     print("=" * 60)
     
-    for model in models:
+    # 超过该大小的文件（UNet 等）改用 aria2c 多连接分段下载
+    aria2_min_size = 1024 ** 3
+
+    def _hf_download(model):
+        kwargs = dict(
+            repo_id=model["repo_id"],
+            filename=model["filename"],
+            cache_dir=str(hf_cache_dir),
+        )
+        try:
+            return hf_hub_download(**kwargs)
+        except Exception as e:
+            if not hf_constants.HF_HUB_ENABLE_HF_TRANSFER:
+                raise
+            # hf_transfer 对部分失败直接报错，关闭后用默认下载器重试
+            print(f"⚠️ {model['name']} hf_transfer 下载失败，回退到默认下载器: {e}")
+            hf_constants.HF_HUB_ENABLE_HF_TRANSFER = False
+            return hf_hub_download(**kwargs)
+
+    def _aria2_download(download_url, target_dir, target_path):
+        # 先写入 .part 文件，完成后原子替换，避免中断的文件被误判为已存在
+        part_name = f"{target_path.name}.part"
+        subprocess.run(
+            [
+                "aria2c",
+                "-x", "8",
+                "-s", "8",
+                "--file-allocation=none",
+                "--check-certificate=true",
+                "--continue=true",
+                "--async-dns=true",
+                "-d", str(target_dir),
+                "-o", part_name,
+                download_url,
+            ],
+            check=True,
+        )
+        os.replace(target_dir / part_name, target_path)
+
+    def _fetch(model):
         target_dir = cache_dir / model["local_dir"]
         target_dir.mkdir(parents=True, exist_ok=True)
         target_path = target_dir / model["name"]
-        
-        if target_path.exists():
+
+        if model["name"] in existing[model["local_dir"]]:
             print(f"✅ {model['name']} 已存在")
-            continue
-        
+            return
+
         print(f"📥 下载 {model['name']}...")
         print(f"   仓库: {model['repo_id']}")
         print(f"   文件: {model['filename']}")
-        
+
         try:
-            downloaded_path = hf_hub_download(
-                repo_id=model["repo_id"],
-                filename=model["filename"],
-                local_dir=str(target_dir),
-                local_dir_use_symlinks=False,
-            )
-            
-            # 重命名文件到目标名称
-            downloaded_path = Path(downloaded_path)
-            if downloaded_path.name != model["name"]:
-                import shutil
-                shutil.move(str(downloaded_path), str(target_path))
-                # 清理空目录
-                try:
-                    for parent in downloaded_path.parents:
-                        if parent == target_dir:
-                            break
-                        parent.rmdir()
-                except OSError:
-                    pass
-            
+            url = hf_hub_url(repo_id=model["repo_id"], filename=model["filename"])
+            metadata = get_hf_file_metadata(url)
+            size = metadata.size or 0
+            # 元数据请求已经解析出 CDN 的最终地址，aria2c 的每个连接都直接连过去，
+            # 不必各自再走一次 huggingface.co 的重定向
+            download_url = metadata.location or url
+
+            if model.get("quantize") == "fp8_e4m3fn":
+                # 原始 bf16 文件只作为中间产物，转换完成后删除
+                source_path = target_dir / f"{model['name']}.bf16"
+                print(f"   使用 aria2c 多连接下载 ({size / 1024 ** 3:.1f} GB)")
+                _aria2_download(download_url, target_dir, source_path)
+                print("   转换为 fp8 e4m3...")
+                _quantize_fp8(source_path, target_path)
+                source_path.unlink()
+            elif size >= aria2_min_size:
+                print(f"   使用 aria2c 多连接下载 ({size / 1024 ** 3:.1f} GB)")
+                _aria2_download(download_url, target_dir, target_path)
+            else:
+                # 文件保存在 HF 缓存中，目标路径只是指向它的符号链接
+                downloaded_path = _hf_download(model)
+                if target_path.is_symlink():
+                    target_path.unlink()
+                target_path.symlink_to(downloaded_path)
+
             print(f"✅ {model['name']} 下载完成")
         except Exception as e:
             print(f"❌ {model['name']} 下载失败: {e}")
             raise
-    
+
+    # 每个模型目录只做一次 scandir，代替逐个文件的 exists() 检查
+    def _scan_existing(local_dir):
+        try:
+            with os.scandir(cache_dir / local_dir) as entries:
+                return {entry.name for entry in entries if entry.is_file()}
+        except FileNotFoundError:
+            return set()
+
+    existing = {local_dir: _scan_existing(local_dir) for local_dir in {m["local_dir"] for m in models}}
+
+    # 并行下载：每个文件独立的连接，充分利用构建机带宽
+    max_workers = int(os.environ.get("HF_PARALLEL_DOWNLOADING_WORKERS", "8"))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(models)))) as executor:
+        futures = [executor.submit(_fetch, model) for model in models]
+        for future in as_completed(futures):
+            future.result()
+
+    # 写入清单文件，check_models 只需读取这一个文件即可确认模型完整
+    manifest = {
+        "files": {
+            f"{model['local_dir']}/{model['name']}": (cache_dir / model["local_dir"] / model["name"]).stat().st_size
+            for model in models
+        }
+    }
+    manifest_tmp = cache_dir / ".manifest.json.tmp"
+    manifest_tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(manifest_tmp, cache_dir / ".manifest.json")
+
     print("=" * 60)
     print("✅ 所有模型下载完成!")
     print("=" * 60)
 
+    return manifest["files"]
+
 
 image = (
     modal.Image.debian_slim(python_version="3.11")
@@ -158,71 +395,53 @@ image = (
     .pip_install(
         "torch==2.1.0",
         "torchvision==0.16.0",
-        "torchaudio==2.1.0",
         "comfy-cli",
         "fastapi",
         "uvicorn",
         "pydantic",
         "huggingface_hub",
+        "hf_transfer",
+        "safetensors",
+        "urllib3",
+        "websocket-client",
+        "orjson",
         "Pillow",
     )
+    # 使用 hf_transfer (Rust) 分段并行下载大文件
+    .env({"HF_HUB_ENABLE_HF_TRANSFER": "1", "HF_HUB_DOWNLOAD_TIMEOUT": "60"})
     .run_commands(
-        # 安装 ComfyUI
-        "comfy --skip-prompt install --nvidia",
+        # 安装 ComfyUI 和自定义节点（合并为一层，浅克隆跳过历史记录）
+        "comfy --skip-prompt install --nvidia && "
+        "cd /root/comfy/ComfyUI/custom_nodes && "
+        "git clone --depth 1 --single-branch https://github.com/lrzjason/Comfyui-QwenEditUtils && "
+        "git clone --depth 1 --single-branch https://github.com/city96/ComfyUI-GGUF && "
+        "git clone --depth 1 --single-branch https://github.com/ltdrdata/ComfyUI-Impact-Pack was-node-suite-comfyui && "
+        "git clone --depth 1 --single-branch https://github.com/yolain/ComfyUI-Easy-Use",
     )
+    # 构建时预先创建指向模型卷的符号链接（/cache 在运行时挂载后即生效），
+    # 容器启动时无需再逐个创建链接
     .run_commands(
-        # 安装自定义节点
-        "cd /root/comfy/ComfyUI/custom_nodes && "
-        "git clone https://github.com/lrzjason/Comfyui-QwenEditUtils && "
-        "git clone https://github.com/city96/ComfyUI-GGUF && "
-        "git clone https://github.com/ltdrdata/ComfyUI-Impact-Pack was-node-suite-comfyui && "
-        "git clone https://github.com/yolain/ComfyUI-Easy-Use",
+        " && ".join(
+            f"mkdir -p {paths['comfyui']} && ln -sfn {paths['cache'] / model_file} {paths['comfyui'] / model_file}"
+            for model_type, paths in MODEL_PATHS.items()
+            for model_file in MODELS.get(model_type, [])
+        ),
     )
+    # 编译缓存放在模型卷上，冷启动的容器可以复用已编译的 Inductor/Triton 内核
+    # （放在最后一步，只影响运行时，不影响镜像构建）
+    .env({
+        "TORCHINDUCTOR_CACHE_DIR": "/cache/torch_compile",
+        "TRITON_CACHE_DIR": "/cache/triton",
+        "XDG_CACHE_HOME": "/cache/xdg",
+    })
 )
 
-# ============================================================================
-# 模型路径配置
-# ============================================================================
-
-COMFYUI_ROOT = Path("/root/comfy/ComfyUI")
-CACHE_ROOT = Path("/cache")
-
-# 模型目录映射：缓存目录 -> ComfyUI 目录
-MODEL_PATHS = {
-    "vae": {
-        "cache": CACHE_ROOT / "models" / "vae",
-        "comfyui": COMFYUI_ROOT / "models" / "vae",
-    },
-    "clip": {
-        "cache": CACHE_ROOT / "models" / "clip",
-        "comfyui": COMFYUI_ROOT / "models" / "clip",
-    },
-    "unet": {
-        "cache": CACHE_ROOT / "models" / "unet",
-        "comfyui": COMFYUI_ROOT / "models" / "diffusion_models",  # ComfyUI 使用 diffusion_models 目录
-    },
-    "loras": {
-        "cache": CACHE_ROOT / "models" / "loras",
-        "comfyui": COMFYUI_ROOT / "models" / "loras",
-    },
-}
-
-# 模型文件列表 (Requirements 5.6, 5.7)
-MODELS = {
-    "vae": ["qwen_image_vae.safetensors"],
-    "clip": ["qwen_2.5_vl_7b.safetensors"],
-    "unet": ["Qwen-Image-Edit-2511.safetensors"],
-    "loras": [
-        "Qwen-Image-Lightning-4steps-V1.0.safetensors",
-        "Qwen-Image-Lightning-8steps-V1.0.safetensors",
-    ],
-}
-
 # ============================================================================
 # 预设视角提示词
 # ============================================================================
 
-PERSPECTIVE_PROMPTS = {
+# 只读映射，防止被请求处理代码意外修改；键统一驻留 (intern)
+PERSPECTIVE_PROMPTS = MappingProxyType({sys.intern(key): prompt for key, prompt in {
     "front": "Next Scene：正面视角",
     "left_45": "Next Scene：将镜头向左旋转45度",
     "right_45": "Next Scene：将镜头向右旋转45度",
@@ -234,20 +453,31 @@ PERSPECTIVE_PROMPTS = {
     "move_backward": "Next Scene：将镜头向后移动",
     "move_left": "Next Scene：将镜头向左移动",
     "move_right": "Next Scene：将镜头向右移动",
-}
+}.items()})
 
 
 # ============================================================================
 # ComfyUI 服务类
 # ============================================================================
 
+# 容器配置（main() 打印同一组常量，避免输出与实际配置不一致）
+GPU_TYPE = "L40S"  # Requirement 5.1: L40S 或 A100 GPU
+SCALEDOWN_WINDOW = 600  # Requirement 5.2: 10分钟保活，让一次突发请求共享 ~20GB 模型加载
+MIN_CONTAINERS = 1  # 常驻 1 个热容器，避免空闲后冷启动重新加载模型
+MAX_CONCURRENT_INPUTS = 4
+
+
 @app.cls(
     image=image,
-    gpu="L40S",  # Requirement 5.1: L40S 或 A100 GPU
-    scaledown_window=300,  # Requirement 5.2: 5分钟保活
+    gpu=GPU_TYPE,
+    scaledown_window=SCALEDOWN_WINDOW,
+    min_containers=MIN_CONTAINERS,
     volumes={"/cache": vol},  # Requirement 5.4: 模型缓存卷
     timeout=600,  # 10分钟超时（支持多图生成）
 )
+# 同一容器内只有一个 ComfyUI 服务器和一份模型权重（UNet/CLIP/VAE 合计约 20GB，
+# L40S 48GB 显存），并发输入只是在 ComfyUI 队列中排队，不会额外占用显存
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
 class ComfyUI:
     """
     ComfyUI 服务类
@@ -255,6 +485,9 @@ class ComfyUI:
     使用 Modal 的 @modal.cls 装饰器配置 GPU 和容器设置。
     使用 @modal.enter 装饰器在容器启动时启动 ComfyUI 服务器。
     
+    类属性只保存轻量状态；模型链接、服务器启动等昂贵的初始化放在
+    @modal.enter 中，每个容器只执行一次，而不是每个请求执行一次。
+    
     Requirements:
     - 5.3: 使用 @modal.enter 装饰器启动 ComfyUI 服务器
     - 5.8: 暴露 FastAPI 端点
@@ -262,6 +495,8 @@ class ComfyUI:
     
     port: int = 8188
     comfyui_process: subprocess.Popen = None
+    # 到本地 ComfyUI 的 keep-alive 连接池，在 @modal.enter 中创建
+    http = None
     
     @modal.enter()
     def launch_comfy_background(self):
@@ -271,48 +506,75 @@ class ComfyUI:
         1. 设置模型符号链接
         2. 启动 ComfyUI 后台服务
         3. 等待服务器健康检查通过
+        4. 运行预热工作流（COMFYUI_WARMUP=0 时跳过）
         
         Requirements:
         - 10.1: 模型加载失败时记录错误
         """
-        import time
-        
         print("=" * 60)
         print("🚀 启动 ComfyUI 服务器...")
         print("=" * 60)
         
-        # 1. 设置模型符号链接
+        # 0. 确保卷上的编译缓存目录存在
+        for env_var in ("TORCHINDUCTOR_CACHE_DIR", "TRITON_CACHE_DIR", "XDG_CACHE_HOME"):
+            cache_dir = os.environ.get(env_var)
+            if cache_dir:
+                Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        
+        # 1. 设置模型符号链接（镜像中已预先创建，全部正确时跳过卷上的检查）
         try:
-            self._setup_model_symlinks()
+            if not self._model_symlinks_ready():
+                self._setup_model_symlinks()
         except Exception as e:
             # Requirement 10.1: 记录模型加载错误
             logger.error(f"Failed to setup model symlinks: {e}")
             raise RuntimeError(f"Model setup failed: {e}")
         
+        # 预读模型文件，与服务器启动并行进行
+        self._prefetch_model_files()
+        
+        # 所有对 ComfyUI 的请求复用同一个连接池，避免每次轮询都重新建立 TCP 连接
+        import urllib3
+        self.http = urllib3.PoolManager(num_pools=1, maxsize=16, block=False, retries=False)
+        
         # 2. 启动 ComfyUI 后台服务
         print(f"\n📡 启动 ComfyUI 服务器 (端口: {self.port})...")
         
-        # 使用 comfy launch --background 启动
-        cmd = f"comfy launch --background -- --port {self.port} --listen 127.0.0.1"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            error_msg = f"ComfyUI 启动命令失败: {result.stderr}"
+        # 直接用当前解释器运行 ComfyUI 的 main.py，省去 comfy-cli 包装进程的启动开销
+        try:
+            self.comfyui_process = subprocess.Popen(
+                [
+                    sys.executable, "main.py",
+                    "--port", str(self.port),
+                    "--listen", "127.0.0.1",
+                ],
+                cwd=COMFYUI_ROOT,
+            )
+        except OSError as e:
+            error_msg = f"ComfyUI 启动命令失败: {e}"
             logger.error(error_msg)
             print(f"❌ {error_msg}")
-            raise RuntimeError(f"Failed to start ComfyUI: {result.stderr}")
+            raise RuntimeError(f"Failed to start ComfyUI: {e}")
         
-        print(f"✅ ComfyUI 启动命令执行成功")
+        print(f"✅ ComfyUI 进程已启动 (PID: {self.comfyui_process.pid})")
         
         # 3. 等待服务器健康检查通过
         print("\n⏳ 等待 ComfyUI 服务器就绪...")
         try:
-            self._poll_server_health(max_retries=60, delay=2.0)
+            # 指数退避：启动初期高频探测，服务器就绪后尽快开始处理请求
+            self._poll_server_health(timeout=120.0)
         except RuntimeError as e:
             # Requirement 10.1: 记录服务器启动失败
+            returncode = self.comfyui_process.poll()
+            if returncode is not None:
+                logger.error(f"ComfyUI process exited with code {returncode}")
             logger.error(f"ComfyUI server health check failed: {e}")
             raise
         
+        # 4. 预热：完整执行一次工作流，第一个真实请求不再承担模型加载和内核编译
+        if os.environ.get("COMFYUI_WARMUP", "1") == "1":
+            self._warm_up()
+        
         print("\n" + "=" * 60)
         print("✅ ComfyUI 服务器已就绪!")
         print("=" * 60)
@@ -333,6 +595,7 @@ class ComfyUI:
         print("\n🔗 设置模型符号链接...")
         
         missing_models = []
+        link_tasks = []
         
         for model_type, paths in MODEL_PATHS.items():
             cache_dir = paths["cache"]
@@ -351,30 +614,14 @@ class ComfyUI:
                     missing_models.append(f"{model_type}/{model_file}")
                 continue
             
-            # 为每个模型文件创建符号链接
-            for model_file in MODELS.get(model_type, []):
-                cache_file = cache_dir / model_file
-                comfyui_file = comfyui_dir / model_file
-                
-                if not cache_file.exists():
-                    warning_msg = f"模型文件不存在: {cache_file}"
-                    logger.warning(warning_msg)
-                    print(f"⚠️ {warning_msg}")
-                    missing_models.append(f"{model_type}/{model_file}")
-                    continue
-                
-                # 如果目标已存在，先删除
-                if comfyui_file.exists() or comfyui_file.is_symlink():
-                    comfyui_file.unlink()
-                
-                # 创建符号链接
-                try:
-                    os.symlink(cache_file, comfyui_file)
-                    print(f"   ✅ {model_file} -> {comfyui_dir.name}/")
-                except OSError as e:
-                    error_msg = f"创建符号链接失败 {model_file}: {e}"
-                    logger.error(error_msg)
-                    raise RuntimeError(error_msg)
+            link_tasks.extend((model_type, model_file) for model_file in MODELS.get(model_type, []))
+        
+        # 为每个模型文件创建符号链接；每个文件都是几次独立的卷元数据调用，
+        # 放进线程池并行执行（文件系统调用期间会释放 GIL）
+        if link_tasks:
+            with ThreadPoolExecutor(max_workers=min(16, len(link_tasks))) as executor:
+                results = executor.map(lambda task: self._link_model_file(*task), link_tasks)
+                missing_models.extend(missing for missing in results if missing)
         
         # 检查是否有必需的模型缺失
         if missing_models:
@@ -386,15 +633,115 @@ class ComfyUI:
         
         print("🔗 模型符号链接设置完成")
     
-    def _poll_server_health(self, max_retries: int = 60, delay: float = 2.0) -> bool:
+    def _model_symlinks_ready(self) -> bool:
+        """
+        检查所有模型链接是否已指向缓存文件
+        
+        只读取 ComfyUI 目录中的链接本身（镜像本地文件系统），不访问模型卷。
+        
+        Returns:
+            bool: 所有链接都已正确时返回 True
+        """
+        for model_type, paths in MODEL_PATHS.items():
+            for model_file in MODELS.get(model_type, []):
+                try:
+                    if os.readlink(paths["comfyui"] / model_file) != str(paths["cache"] / model_file):
+                        return False
+                except OSError:
+                    return False
+        return True
+    
+    def _link_model_file(self, model_type: str, model_file: str) -> Optional[str]:
+        """
+        将单个缓存模型文件链接到 ComfyUI 目录
+        
+        Args:
+            model_type: 模型类型（MODEL_PATHS 的键）
+            model_file: 模型文件名
+            
+        Returns:
+            Optional[str]: 缓存文件缺失时返回 "类型/文件名"，否则返回 None
+            
+        Raises:
+            RuntimeError: 当创建符号链接失败时
+        """
+        cache_file = MODEL_PATHS[model_type]["cache"] / model_file
+        comfyui_dir = MODEL_PATHS[model_type]["comfyui"]
+        comfyui_file = comfyui_dir / model_file
+        
+        if not cache_file.exists():
+            warning_msg = f"模型文件不存在: {cache_file}"
+            logger.warning(warning_msg)
+            print(f"⚠️ {warning_msg}")
+            return f"{model_type}/{model_file}"
+        
+        # 已经指向缓存文件时无需重建（readlink 只读链接本身，不访问卷上的目标文件）
+        try:
+            if os.readlink(comfyui_file) == str(cache_file):
+                return None
+        except OSError:
+            pass
+        
+        # 先在临时名称上创建链接，再原子替换目标，中途失败也不会留下缺失的链接
+        tmp_file = comfyui_file.with_name(f"{comfyui_file.name}.tmp")
+        try:
+            # 直接 unlink 清理上次中断留下的临时链接，不存在时忽略，省去单独的 lstat
+            try:
+                os.unlink(tmp_file)
+            except FileNotFoundError:
+                pass
+            os.symlink(cache_file, tmp_file)
+            os.replace(tmp_file, comfyui_file)
+            print(f"   ✅ {model_file} -> {comfyui_dir.name}/")
+        except OSError as e:
+            error_msg = f"创建符号链接失败 {model_file}: {e}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        
+        return None
+    
+    def _prefetch_model_files(self):
+        """
+        提示内核异步预读卷上的模型文件
+        
+        ComfyUI 通过 safetensors 以 mmap 方式加载权重，首次推理时按页从卷上读取。
+        这里对每个文件发出 POSIX_FADV_WILLNEED，让内核在服务器启动期间
+        并行地把文件读入页缓存；不会把数据拷贝进进程内存，也不会阻塞启动。
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return
+        
+        for model_type, paths in MODEL_PATHS.items():
+            for model_file in MODELS.get(model_type, []):
+                cache_file = paths["cache"] / model_file
+                try:
+                    fd = os.open(cache_file, os.O_RDONLY)
+                except OSError:
+                    continue
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                except OSError as e:
+                    logger.warning(f"预读模型文件失败 {cache_file}: {e}")
+                finally:
+                    os.close(fd)
+    
+    def _poll_server_health(
+        self,
+        timeout: float = 120.0,
+        base_delay: float = 0.05,
+        max_delay: float = 2.0,
+    ) -> bool:
         """
         检查 ComfyUI 服务器健康状态
         
         轮询 ComfyUI 的 /system_stats 端点，直到服务器就绪或超时。
+        重试间隔从 base_delay 开始按 1.5 倍指数增长，上限 max_delay，
+        并加入 ±20% 抖动，避免同时启动的容器以相同节奏探测。
         
         Args:
-            max_retries: 最大重试次数
-            delay: 重试间隔（秒）
+            timeout: 最长等待时间（秒）
+            base_delay: 首次重试间隔（秒）
+            max_delay: 最大重试间隔（秒）
             
         Returns:
             bool: 服务器是否健康
@@ -402,27 +749,39 @@ class ComfyUI:
         Raises:
             RuntimeError: 服务器启动超时
         """
-        import time
-        import urllib.request
-        import urllib.error
+        import urllib3
         
         url = f"http://127.0.0.1:{self.port}/system_stats"
+        start_time = time.time()
+        last_status_print = 0.0
+        attempt = 0
         
-        for i in range(max_retries):
+        while time.time() - start_time < timeout:
+            attempt += 1
             try:
-                with urllib.request.urlopen(url, timeout=5) as response:
-                    if response.status == 200:
-                        print(f"   ✅ ComfyUI 服务器健康检查通过 (尝试 {i + 1}/{max_retries})")
-                        return True
-            except (urllib.error.URLError, urllib.error.HTTPError) as e:
-                if i % 5 == 0:  # 每 5 次打印一次状态
-                    print(f"   ⏳ 等待中... (尝试 {i + 1}/{max_retries})")
+                response = self.http.request("GET", url, timeout=5.0)
+                if response.status == 200:
+                    elapsed = time.time() - start_time
+                    print(f"   ✅ ComfyUI 服务器健康检查通过 (尝试 {attempt} 次, {elapsed:.1f}s)")
+                    return True
+            except urllib3.exceptions.HTTPError as e:
+                elapsed = time.time() - start_time
+                if elapsed - last_status_print >= 10:  # 每 10 秒打印一次状态
+                    print(f"   ⏳ 等待中... ({int(elapsed)}s / {int(timeout)}s)")
+                    last_status_print = elapsed
             except Exception as e:
                 print(f"   ⚠️ 健康检查异常: {e}")
             
-            time.sleep(delay)
+            # 进程已经退出时不必等到超时
+            if self.comfyui_process is not None and self.comfyui_process.poll() is not None:
+                raise RuntimeError(
+                    f"ComfyUI process exited with code {self.comfyui_process.returncode} before becoming healthy"
+                )
+            
+            delay = min(max_delay, base_delay * (1.5 ** (attempt - 1)))
+            time.sleep(delay * random.uniform(0.8, 1.2))
         
-        raise RuntimeError(f"ComfyUI server failed to start after {max_retries * delay} seconds")
+        raise RuntimeError(f"ComfyUI server failed to start after {timeout} seconds")
     
     def _check_server_health(self) -> bool:
         """
@@ -431,17 +790,87 @@ class ComfyUI:
         Returns:
             bool: 服务器是否健康
         """
-        import urllib.request
-        import urllib.error
-        
         url = f"http://127.0.0.1:{self.port}/system_stats"
         
         try:
-            with urllib.request.urlopen(url, timeout=5) as response:
-                return response.status == 200
-        except (urllib.error.URLError, urllib.error.HTTPError, Exception):
+            return self.http.request("GET", url, timeout=5.0).status == 200
+        except Exception:
             return False
     
+    def _warm_up(self):
+        """
+        容器启动时运行一次预热工作流
+        
+        模板的目标像素数、步数和采样器都是固定的，第一次执行完成的模型加载、
+        cuDNN 算法选择和 Triton 内核编译可以被之后的请求直接复用。
+        预热失败只记录警告，不影响容器启动。
+        """
+        import io
+        from PIL import Image
+        
+        print("\n🔥 运行预热工作流...")
+        start_time = time.time()
+        try:
+            buffer = io.BytesIO()
+            Image.new("RGB", (1024, 1024), color="white").save(buffer, format="PNG")
+            output_paths = self._infer_batch_from_bytes(
+                buffer.getvalue(), ["warmup"], output_prefixes=["warmup"]
+            )
+            for path in output_paths:
+                path.unlink(missing_ok=True)
+        except Exception as e:
+            logger.warning("ComfyUI warm-up failed: %s", e)
+            return
+        
+        print(f"✅ 预热完成 ({time.time() - start_time:.1f}s)")
+    
+    def _save_input_image(self, image_data: bytes) -> str:
+        """
+        按内容哈希保存输入图片到 ComfyUI input 目录
+        
+        同一张图片总是得到相同的文件名，重复提交时 ComfyUI 的执行缓存可以
+        直接复用 LoadImage、缩放、VAEEncode 和提示词编码节点的结果。
+        并发请求可能共用同一个文件，因此请求结束后不删除，只保留最近使用的
+        MAX_CACHED_INPUT_IMAGES 张。
+        
+        Args:
+            image_data: 输入图片字节数据
+            
+        Returns:
+            str: input 目录下的文件名
+        """
+        input_dir = COMFYUI_ROOT / "input"
+        input_dir.mkdir(parents=True, exist_ok=True)
+        input_filename = f"input_{hashlib.sha256(image_data).hexdigest()[:16]}.png"
+        input_path = input_dir / input_filename
+        
+        try:
+            # 已存在时只刷新修改时间，清理时按最近使用顺序保留
+            os.utime(input_path)
+            return input_filename
+        except FileNotFoundError:
+            pass
+        
+        # 先写临时文件再原子替换，并发请求不会读到写了一半的图片
+        tmp_path = input_dir / f".{input_filename}.{uuid.uuid4().hex[:8]}"
+        tmp_path.write_bytes(image_data)
+        os.replace(tmp_path, input_path)
+        
+        try:
+            with os.scandir(input_dir) as it:
+                cached = [
+                    (entry.stat().st_mtime, entry.path)
+                    for entry in it
+                    if entry.name.startswith("input_") and entry.name.endswith(".png")
+                ]
+            cached.sort(reverse=True)
+            for _, stale_path in cached[MAX_CACHED_INPUT_IMAGES:]:
+                os.unlink(stale_path)
+        except OSError as e:
+            logger.warning("Failed to prune cached input images: %s", e)
+        
+        return input_filename
+    
     # ========================================================================
     # 单图推理方法 (Requirement 6.5, 6.6)
     # ========================================================================
@@ -479,15 +908,6 @@ class ComfyUI:
             - 6.6: 使用 VAEDecode 解码 latent 输出为图片
             - 10.2: 图像生成失败时返回描述性错误消息
         """
-        import base64
-        import json
-        import time
-        import uuid
-        import urllib.request
-        import urllib.error
-        from PIL import Image
-        import io
-        
         # 确保服务器健康 - Requirement 10.1
         if not self._check_server_health():
             error_msg = "ComfyUI server is not healthy"
@@ -496,15 +916,10 @@ class ComfyUI:
         
         # 1. 保存输入图片到 ComfyUI input 目录
         client_id = uuid.uuid4().hex[:8]
-        input_filename = f"input_{client_id}.png"
-        input_path = COMFYUI_ROOT / "input" / input_filename
-        input_path.parent.mkdir(parents=True, exist_ok=True)
         
         # 解码 base64 图片并保存
         try:
-            image_data = base64.b64decode(input_image_base64)
-            with open(input_path, "wb") as f:
-                f.write(image_data)
+            input_filename = self._save_input_image(base64.b64decode(input_image_base64))
         except Exception as e:
             error_msg = f"Failed to save input image: {e}"
             logger.error(error_msg)
@@ -512,11 +927,11 @@ class ComfyUI:
         
         print(f"📷 输入图片已保存: {input_filename}")
         
-        # 2. 创建工作流
+        # 2. 直接在预编译的模板字节串上替换参数，生成可提交的请求体
         try:
-            from .workflow_executor import create_workflow, save_workflow_to_file
+            from .workflow_executor import render_workflow_bytes
             
-            workflow = create_workflow(
+            workflow = render_workflow_bytes(
                 input_image=input_filename,
                 prompt=prompt,
                 steps=steps,
@@ -529,12 +944,14 @@ class ComfyUI:
             logger.error(error_msg)
             raise RuntimeError(error_msg)
         
-        # 3. 保存工作流到临时文件
-        workflow_path = COMFYUI_ROOT / "temp" / f"workflow_{client_id}.json"
-        workflow_path.parent.mkdir(parents=True, exist_ok=True)
-        save_workflow_to_file(workflow, workflow_path)
-        
-        print(f"📝 工作流已保存: {workflow_path.name}")
+        # 3. 调试时保存工作流到临时文件（默认跳过，避免每次请求写盘）
+        workflow_path = None
+        if os.environ.get("COMFYUI_SAVE_WORKFLOWS") == "1":
+            workflow_path = COMFYUI_ROOT / "temp" / f"workflow_{client_id}.json"
+            workflow_path.parent.mkdir(parents=True, exist_ok=True)
+            # 直接写入已渲染的请求体字节，无需解析后重新序列化
+            workflow_path.write_bytes(workflow)
+            print(f"📝 工作流已保存: {workflow_path.name}")
         
         # 4. 通过 ComfyUI API 执行工作流 - Requirement 10.2, 10.5
         try:
@@ -547,18 +964,148 @@ class ComfyUI:
             logger.error(error_msg)
             raise RuntimeError(error_msg)
         
-        # 5. 清理临时文件
+        # 5. 清理临时文件（输入图片按内容缓存，由 _save_input_image 清理）
         try:
-            input_path.unlink()
-            workflow_path.unlink()
+            if workflow_path is not None:
+                workflow_path.unlink()
         except Exception as e:
             logger.warning(f"Failed to cleanup temp files: {e}")
         
         return output_image
     
+    @modal.method()
+    def infer_batch(
+        self,
+        input_image_base64: str,
+        prompts: List[str],
+        steps: int = 8,
+        cfg: float = 3.0,
+        seed: Optional[str] = None,
+        output_prefixes: Optional[List[str]] = None,
+    ) -> List[bytes]:
+        """
+        一次提交生成多个视角的图片
+        
+        所有视角共享同一个工作流：输入图片只加载、缩放和 VAE 编码一次，
+        每个提示词拥有独立的采样分支。
+        
+        Args:
+            input_image_base64: Base64 编码的输入图片
+            prompts: 每个视角的提示词
+            steps: 生成步数 (4-8)
+            cfg: CFG 强度 (1.0-5.0)
+            seed: 随机种子（可选）
+            output_prefixes: 每个视角的输出文件前缀
+            
+        Returns:
+            List[bytes]: 与 prompts 顺序一致的图片字节数据
+            
+        Raises:
+            RuntimeError: 当 ComfyUI 服务器不健康或工作流执行失败时
+            TimeoutError: 当工作流执行超时时
+            
+        Requirements:
+            - 4.7: 为每个选中的视角执行工作流
+            - 4.8: 支持批量生成多个视角
+        """
+        # 确保服务器健康 - Requirement 10.1
+        if not self._check_server_health():
+            error_msg = "ComfyUI server is not healthy"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        
+        try:
+            image_data = base64.b64decode(input_image_base64)
+        except Exception as e:
+            error_msg = f"Failed to decode input image: {e}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        
+        output_paths = self._infer_batch_from_bytes(
+            image_data, prompts, steps, cfg, seed, output_prefixes
+        )
+        return [path.read_bytes() for path in output_paths]
+    
+    def _infer_batch_from_bytes(
+        self,
+        image_data: bytes,
+        prompts: List[str],
+        steps: int = 8,
+        cfg: float = 3.0,
+        seed: Optional[str] = None,
+        output_prefixes: Optional[List[str]] = None,
+    ) -> List[Path]:
+        """
+        使用已解码的输入图片执行批量生成
+        
+        generate 在验证阶段已经解码过图片并检查过服务器状态，
+        直接调用此方法可避免重复解码；参数与 infer_batch 相同。
+        ComfyUI 与本进程在同一容器中，结果直接以输出目录中的文件路径返回，
+        调用方按需读取或流式发送，不必经过 /view 把整张图片读进内存。
+        
+        Args:
+            image_data: 输入图片字节数据
+            prompts: 每个视角的提示词
+            steps: 生成步数 (4-8)
+            cfg: CFG 强度 (1.0-5.0)
+            seed: 随机种子（可选）
+            output_prefixes: 每个视角的输出文件前缀
+            
+        Returns:
+            List[Path]: 与 prompts 顺序一致的输出图片路径
+        """
+        if output_prefixes is None:
+            output_prefixes = ["qwen_output"] * len(prompts)
+        
+        # 1. 保存输入图片到 ComfyUI input 目录
+        client_id = uuid.uuid4().hex[:8]
+        
+        try:
+            input_filename = self._save_input_image(image_data)
+        except Exception as e:
+            error_msg = f"Failed to save input image: {e}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        
+        # 2. 创建共享编码器的批量工作流
+        try:
+            from .workflow_executor import NODE_IDS, batch_node_id, create_batch_workflow
+            
+            workflow = create_batch_workflow(
+                input_image=input_filename,
+                prompts=prompts,
+                steps=steps,
+                cfg=cfg,
+                seed=seed,
+                output_prefixes=[f"{prefix}_{client_id}" for prefix in output_prefixes],
+            )
+        except Exception as e:
+            error_msg = f"Failed to create workflow: {e}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        
+        # 3. 通过 ComfyUI API 执行工作流 - Requirement 10.2, 10.5
+        output_node_ids = [
+            batch_node_id(NODE_IDS["save_image"], index) for index in range(len(prompts))
+        ]
+        try:
+            # 超时按视角数量放大，与逐个提交时的总时长上限一致
+            targets = self._wait_for_outputs(
+                workflow, client_id, output_node_ids, timeout=120 * len(prompts)
+            )
+        except TimeoutError as e:
+            logger.error(f"Workflow execution timed out: {e}")
+            raise
+        except Exception as e:
+            error_msg = f"Workflow execution failed: {e}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        
+        return [COMFYUI_ROOT / "output" / subfolder / filename for filename, subfolder in targets]
+    
     def _execute_workflow_via_api(
         self,
-        workflow: dict,
+        workflow: Union[dict, bytes],
         client_id: str,
         output_prefix: str,
         timeout: int = 120,
@@ -567,7 +1114,7 @@ class ComfyUI:
         通过 ComfyUI API 执行工作流
         
         Args:
-            workflow: 工作流字典
+            workflow: 工作流字典，或已序列化的工作流 JSON 字节串
             client_id: 客户端 ID
             output_prefix: 输出文件前缀
             timeout: 超时时间（秒）
@@ -579,51 +1126,91 @@ class ComfyUI:
             TimeoutError: 当工作流执行超时时 (Requirement 10.5)
             RuntimeError: 当工作流执行失败时 (Requirement 10.2)
         """
-        import json
-        import time
-        import urllib.request
-        import urllib.error
-        
-        api_url = f"http://127.0.0.1:{self.port}"
-        
-        # 1. 提交工作流到队列
-        prompt_data = {
-            "prompt": workflow,
-            "client_id": client_id,
-        }
+        # 单图路径只有一个 SaveImage 节点，直接通过 /view 获取它的输出
+        filename, subfolder = self._wait_for_outputs(workflow, client_id, ["80"], timeout)[0]
+        return self._get_image_from_comfyui(filename, subfolder)
+    
+    def _wait_for_outputs(
+        self,
+        workflow: Union[dict, bytes],
+        client_id: str,
+        output_node_ids: List[str],
+        timeout: int = 120,
+    ) -> List[Tuple[str, str]]:
+        """
+        提交工作流并等待所有指定 SaveImage 节点完成
         
-        try:
-            req = urllib.request.Request(
-                f"{api_url}/prompt",
-                data=json.dumps(prompt_data).encode("utf-8"),
-                headers={"Content-Type": "application/json"},
-                method="POST",
-            )
+        Args:
+            workflow: 工作流字典，或已序列化的工作流 JSON 字节串
+            client_id: 客户端 ID
+            output_node_ids: 需要收集输出的 SaveImage 节点 ID
+            timeout: 超时时间（秒）
             
-            with urllib.request.urlopen(req, timeout=10) as response:
-                result = json.loads(response.read().decode("utf-8"))
-                prompt_id = result.get("prompt_id")
-                
-                # 检查是否有错误
-                if "error" in result:
-                    error_msg = f"ComfyUI rejected workflow: {result.get('error')}"
-                    logger.error(error_msg)
-                    raise RuntimeError(error_msg)
-                    
-        except urllib.error.URLError as e:
-            error_msg = f"Failed to submit workflow to ComfyUI: {e}"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
-        except urllib.error.HTTPError as e:
-            error_msg = f"ComfyUI API error: {e.code} - {e.reason}"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
+        Returns:
+            List[Tuple[str, str]]: 按 output_node_ids 顺序排列的 (文件名, 子目录)
+            
+        Raises:
+            TimeoutError: 当工作流执行超时时 (Requirement 10.5)
+            RuntimeError: 当工作流执行失败时 (Requirement 10.2)
+        """
+        import orjson
+        import urllib3
         
-        print(f"📤 工作流已提交: prompt_id={prompt_id}")
+        api_url = f"http://127.0.0.1:{self.port}"
         
-        # 2. 轮询等待执行完成 - Requirement 10.5
+        # 在提交前订阅进度事件，避免错过完成通知
+        ws = self._open_progress_socket(client_id)
         start_time = time.time()
+        try:
+            # 1. 提交工作流到队列；已序列化的工作流直接拼接进请求体，不再重新 dumps
+            if isinstance(workflow, bytes):
+                body = b'{"prompt":' + workflow + b',"client_id":' + orjson.dumps(client_id) + b'}'
+            else:
+                body = orjson.dumps({"prompt": workflow, "client_id": client_id})
+            
+            try:
+                response = self.http.request(
+                    "POST",
+                    f"{api_url}/prompt",
+                    body=body,
+                    headers={"Content-Type": "application/json"},
+                    timeout=10.0,
+                )
+            except urllib3.exceptions.HTTPError as e:
+                error_msg = f"Failed to submit workflow to ComfyUI: {e}"
+                logger.error(error_msg)
+                raise RuntimeError(error_msg)
+            
+            if response.status != 200:
+                error_msg = f"ComfyUI API error: {response.status} - {response.data.decode('utf-8', 'replace')}"
+                logger.error(error_msg)
+                raise RuntimeError(error_msg)
+            
+            result = orjson.loads(response.data)
+            prompt_id = result.get("prompt_id")
+            
+            # 检查是否有错误
+            if "error" in result:
+                error_msg = f"ComfyUI rejected workflow: {result.get('error')}"
+                logger.error(error_msg)
+                raise RuntimeError(error_msg)
+            
+            print(f"📤 工作流已提交: prompt_id={prompt_id}")
+            
+            # 2. 阻塞等待完成事件，完成后历史记录中已经有输出
+            if ws is not None:
+                self._wait_for_completion_event(ws, prompt_id, start_time + timeout)
+        finally:
+            if ws is not None:
+                ws.close()
+        
+        # 3. 读取历史记录获取输出；WebSocket 不可用时退化为轮询 - Requirement 10.5
+        # 轮询 /queue 直到 prompt_id 离开队列，再读取一次历史记录；
+        # 已收到完成事件时直接读取历史记录。
+        # 轮询间隔从 100ms 开始按 1.3 倍增长，上限 1 秒
         last_status_check = 0
+        poll_delay = 0.1
+        check_queue = ws is None
         
         while time.time() - start_time < timeout:
             elapsed = time.time() - start_time
@@ -633,47 +1220,159 @@ class ComfyUI:
                 print(f"   ⏳ 等待生成完成... ({int(elapsed)}s / {timeout}s)")
                 last_status_check = elapsed
             
+            if check_queue and self._prompt_in_queue(api_url, prompt_id):
+                time.sleep(poll_delay)
+                poll_delay = min(1.0, poll_delay * 1.3)
+                continue
+            check_queue = True
+            
             # 检查历史记录
             try:
-                with urllib.request.urlopen(f"{api_url}/history/{prompt_id}", timeout=5) as response:
-                    history = json.loads(response.read().decode("utf-8"))
+                response = self.http.request("GET", f"{api_url}/history/{prompt_id}", timeout=5.0)
+            except urllib3.exceptions.HTTPError as e:
+                logger.warning("Error checking history: %s", e)
+                response = None
+            
+            if response is not None and response.status != 200:
+                if response.status != 404:
+                    logger.warning("Error checking history: HTTP %s", response.status)
+            elif response is not None:
+                history = orjson.loads(response.data)
+                
+                if prompt_id in history:
+                    # 检查是否有错误
+                    status = history[prompt_id].get("status", {})
+                    if status.get("status_str") == "error":
+                        error_messages = status.get("messages", [])
+                        error_msg = f"ComfyUI workflow failed: {error_messages}"
+                        logger.error(error_msg)
+                        raise RuntimeError(error_msg)
                     
-                    if prompt_id in history:
-                        # 检查是否有错误
-                        status = history[prompt_id].get("status", {})
-                        if status.get("status_str") == "error":
-                            error_messages = status.get("messages", [])
-                            error_msg = f"ComfyUI workflow failed: {error_messages}"
-                            logger.error(error_msg)
-                            raise RuntimeError(error_msg)
-                        
-                        outputs = history[prompt_id].get("outputs", {})
-                        # 查找 SaveImage 节点的输出 (node 80)
-                        if "80" in outputs:
-                            images = outputs["80"].get("images", [])
-                            if images:
-                                # 获取第一张图片
-                                image_info = images[0]
-                                filename = image_info.get("filename")
-                                subfolder = image_info.get("subfolder", "")
-                                
-                                print(f"   ✅ 生成完成: {filename}")
-                                
-                                # 从 ComfyUI 获取图片
-                                return self._get_image_from_comfyui(filename, subfolder)
-            except urllib.error.HTTPError as e:
-                if e.code != 404:
-                    logger.warning(f"Error checking history: {e}")
-            except Exception as e:
-                logger.warning(f"Error checking history: {e}")
+                    outputs = history[prompt_id].get("outputs", {})
+                    # 查找 SaveImage 节点的输出，全部就绪后一起返回
+                    image_infos = [
+                        (outputs.get(node_id) or {}).get("images", [])
+                        for node_id in output_node_ids
+                    ]
+                    if all(image_infos):
+                        # 每个节点取第一张图片
+                        targets = [
+                            (images[0].get("filename"), images[0].get("subfolder", ""))
+                            for images in image_infos
+                        ]
+                        for filename, _ in targets:
+                            print(f"   ✅ 生成完成: {filename}")
+                        return targets
             
-            time.sleep(1)
+            time.sleep(poll_delay)
+            poll_delay = min(1.0, poll_delay * 1.3)
         
         # Requirement 10.5: 超时错误
         error_msg = f"Workflow execution timed out after {timeout} seconds"
         logger.error(error_msg)
         raise TimeoutError(error_msg)
     
+    def _prompt_in_queue(self, api_url: str, prompt_id: str) -> bool:
+        """
+        检查工作流是否仍在 ComfyUI 队列中（执行中或等待中）
+        
+        Args:
+            api_url: ComfyUI API 地址
+            prompt_id: 工作流 ID
+            
+        Returns:
+            bool: 仍在队列中返回 True；查询失败时返回 False，由历史记录兜底
+        """
+        import orjson
+        import urllib3
+        
+        try:
+            response = self.http.request("GET", f"{api_url}/queue", timeout=5.0)
+        except urllib3.exceptions.HTTPError as e:
+            logger.warning("Error checking queue: %s", e)
+            return False
+        
+        if response.status != 200:
+            logger.warning("Error checking queue: HTTP %s", response.status)
+            return False
+        
+        queue = orjson.loads(response.data)
+        # 队列条目格式: [number, prompt_id, prompt, extra_data, outputs_to_execute]
+        return any(
+            len(item) > 1 and item[1] == prompt_id
+            for key in ("queue_running", "queue_pending")
+            for item in queue.get(key, [])
+        )
+    
+    def _open_progress_socket(self, client_id: str):
+        """
+        连接 ComfyUI 的 WebSocket 进度事件流
+        
+        Args:
+            client_id: 客户端 ID，与提交工作流时使用的一致
+        
+        Returns:
+            websocket.WebSocket: 已连接的 WebSocket；连接失败时返回 None
+        """
+        import websocket
+        
+        try:
+            return websocket.create_connection(
+                f"ws://127.0.0.1:{self.port}/ws?clientId={client_id}",
+                timeout=5,
+            )
+        except Exception as e:
+            logger.warning("Failed to connect to ComfyUI websocket, falling back to polling: %s", e)
+            return None
+    
+    def _wait_for_completion_event(self, ws, prompt_id: str, deadline: float) -> None:
+        """
+        读取进度事件，直到指定工作流执行结束
+        
+        收到 executing 且 node 为空的事件表示执行完成；execution_error 事件
+        直接抛出错误。超时或连接异常时直接返回，由调用方的轮询逻辑兜底。
+        
+        Args:
+            ws: 已连接的 WebSocket
+            prompt_id: 工作流 ID
+            deadline: 截止时间（time.time() 时间戳）
+        
+        Raises:
+            RuntimeError: 当工作流执行失败时 (Requirement 10.2)
+        """
+        import orjson
+        import websocket
+        
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            
+            try:
+                ws.settimeout(remaining)
+                message = ws.recv()
+            except websocket.WebSocketTimeoutException:
+                return
+            except Exception as e:
+                logger.warning("ComfyUI websocket error, falling back to polling: %s", e)
+                return
+            
+            # 二进制消息是预览图，忽略
+            if not isinstance(message, str):
+                continue
+            
+            event = orjson.loads(message)
+            data = event.get("data") or {}
+            if data.get("prompt_id") != prompt_id:
+                continue
+            
+            if event.get("type") == "executing" and data.get("node") is None:
+                return
+            if event.get("type") == "execution_error":
+                error_msg = f"ComfyUI workflow failed: {data.get('exception_message')}"
+                logger.error(error_msg)
+                raise RuntimeError(error_msg)
+    
     def _get_image_from_comfyui(self, filename: str, subfolder: str = "") -> bytes:
         """
         从 ComfyUI 获取生成的图片
@@ -685,19 +1384,17 @@ class ComfyUI:
         Returns:
             bytes: 图片字节数据
         """
-        import urllib.request
-        import urllib.parse
-        
-        params = urllib.parse.urlencode({
-            "filename": filename,
-            "subfolder": subfolder,
-            "type": "output",
-        })
-        
-        url = f"http://127.0.0.1:{self.port}/view?{params}"
+        url = f"http://127.0.0.1:{self.port}/view"
         
-        with urllib.request.urlopen(url, timeout=30) as response:
-            return response.read()
+        response = self.http.request(
+            "GET",
+            url,
+            fields={"filename": filename, "subfolder": subfolder, "type": "output"},
+            timeout=30.0,
+        )
+        if response.status != 200:
+            raise RuntimeError(f"Failed to fetch image {filename}: HTTP {response.status}")
+        return response.data
     
     # ========================================================================
     # 批量生成 API 端点 (Requirements 4.6, 4.7, 4.8, 4.9, 9.1, 9.2)
@@ -719,7 +1416,8 @@ class ComfyUI:
                 ],
                 "steps": 8,
                 "cfg_scale": 3.0,
-                "seed": "12345"  // optional
+                "seed": "12345",  // optional
+                "response_format": "json"  // optional: "json" | "multipart"
             }
         
         Response:
@@ -737,6 +1435,11 @@ class ComfyUI:
                 "original_image": "base64 encoded original"
             }
         
+        response_format 为 "multipart" 时返回 multipart/mixed：第一部分是
+        不含 image 字段和 original_image 的 JSON 元数据，之后每张图片作为
+        一个 image/png 部分（Content-ID 为百分号编码的 perspective_id），省去 base64 编码
+        和回传原图的开销。
+        
         Requirements:
             - 4.6: 验证请求参数
             - 4.7: 为每个选中的视角执行工作流
@@ -748,10 +1451,7 @@ class ComfyUI:
             - 10.2: 图像生成失败时返回描述性错误消息
             - 10.5: 生成超时后返回超时错误
         """
-        import base64
-        import time
-        from fastapi import Response
-        from fastapi.responses import JSONResponse
+        from fastapi.responses import JSONResponse, StreamingResponse
         
         start_time = time.time()
         
@@ -789,9 +1489,12 @@ class ComfyUI:
         
         # 验证 base64 图片格式
         try:
-            # 尝试解码 base64
+            # 先按 base64 长度估算解码大小，过小的数据不必解码
+            if len(image_base64) * 3 // 4 < 100:  # 太小不可能是有效图片
+                raise ValueError("Image data too small")
+            # 解码结果直接用于后续生成，整个批次只解码这一次
             image_data = base64.b64decode(image_base64)
-            if len(image_data) < 100:  # 太小不可能是有效图片
+            if len(image_data) < 100:
                 raise ValueError("Image data too small")
         except Exception as e:
             logger.warning(f"Invalid image data: {e}")
@@ -833,31 +1536,39 @@ class ComfyUI:
                     }
                 )
         
-        # 验证 steps (4-8)
+        # 验证 steps (4-8) 和 cfg_scale (1.0-5.0)，与测试共用同一个严格模型，
+        # 布尔值、数字字符串和 NaN 都会被拒绝；先报告 steps
+        from pydantic import ValidationError
+        from .types import GENERATION_PARAM_MESSAGES, GenerationParams
+        
         steps = request.get("steps", 8)
-        if not isinstance(steps, int) or steps < 4 or steps > 8:
+        cfg_scale = request.get("cfg_scale", 3.0)
+        try:
+            GenerationParams(steps=steps, cfg_scale=cfg_scale)
+        except ValidationError as e:
+            field = e.errors()[0]["loc"][0]
             return JSONResponse(
                 status_code=400,
                 content={
                     "error": "invalid_params",
-                    "message": "steps must be an integer between 4 and 8"
+                    "message": GENERATION_PARAM_MESSAGES[field]
                 }
             )
         
-        # 验证 cfg_scale (1.0-5.0)
-        cfg_scale = request.get("cfg_scale", 3.0)
-        if not isinstance(cfg_scale, (int, float)) or cfg_scale < 1.0 or cfg_scale > 5.0:
+        # 获取 seed（可选）
+        seed = request.get("seed")
+        
+        # 响应格式（可选）
+        response_format = request.get("response_format", "json")
+        if response_format not in ("json", "multipart"):
             return JSONResponse(
                 status_code=400,
                 content={
-                    "error": "invalid_params",
-                    "message": "cfg_scale must be a number between 1.0 and 5.0"
+                    "error": "validation_error",
+                    "message": "response_format must be 'json' or 'multipart'"
                 }
             )
         
-        # 获取 seed（可选）
-        seed = request.get("seed")
-        
         print(f"   📊 参数验证通过:")
         print(f"      - 视角数量: {len(perspectives)}")
         print(f"      - Steps: {steps}")
@@ -870,71 +1581,77 @@ class ComfyUI:
         
         generated_images = []
         
-        for i, perspective in enumerate(perspectives):
-            perspective_id = perspective.get("id", str(i))
-            perspective_name = perspective.get("name", f"视角{i+1}")
-            prompt = perspective.get("prompt", "")
-            
-            print(f"\n   🎨 生成视角 {i+1}/{len(perspectives)}: {perspective_name}")
-            print(f"      Prompt: {prompt[:50]}...")
+        perspective_ids = [p.get("id", str(i)) for i, p in enumerate(perspectives)]
+        perspective_names = [p.get("name", f"视角{i+1}") for i, p in enumerate(perspectives)]
+        prompts = [p.get("prompt", "") for p in perspectives]
+        
+        print(f"\n   🎨 批量生成 {len(perspectives)} 个视角: {', '.join(perspective_names)}")
+        
+        try:
+            # 所有视角合并为一个工作流提交，共享图片加载和编码；
+            # 复用验证阶段解码得到的图片数据，不再重复解码
+            output_paths = self._infer_batch_from_bytes(
+                image_data=image_data,
+                prompts=prompts,
+                steps=steps,
+                cfg=cfg_scale,
+                seed=seed,
+                output_prefixes=[f"qwen_{perspective_id}" for perspective_id in perspective_ids],
+            )
+        except TimeoutError as e:
+            # Requirement 10.5: 超时错误
+            error_msg = "视角图片生成超时"
+            logger.error(f"Generation timeout: {e}")
+            print(f"      ❌ {error_msg}")
+            return JSONResponse(
+                status_code=504,
+                content={
+                    "error": "timeout",
+                    "message": error_msg
+                }
+            )
+        except RuntimeError as e:
+            # Requirement 10.2: 生成失败
+            error_msg = f"视角图像生成失败: {str(e)}"
+            logger.error(f"Generation failed: {e}")
+            print(f"      ❌ {error_msg}")
+            return JSONResponse(
+                status_code=500,
+                content={
+                    "error": "generation_error",
+                    "message": error_msg
+                }
+            )
+        except Exception as e:
+            # 其他未知错误
+            error_msg = f"视角生成时发生未知错误: {str(e)}"
+            logger.error(f"Unknown error: {e}")
+            print(f"      ❌ {error_msg}")
+            return JSONResponse(
+                status_code=500,
+                content={
+                    "error": "generation_error",
+                    "message": error_msg
+                }
+            )
+        
+        for perspective_id, perspective_name, output_path in zip(perspective_ids, perspective_names, output_paths):
+            # 将结果添加到列表；multipart 响应稍后直接流式发送文件，不做 base64 编码
+            image_entry = {
+                "perspective_id": perspective_id,
+                "perspective_name": perspective_name,
+                "seed_used": seed if seed else "random",
+            }
+            if response_format == "json":
+                # 文件字节直接交给编码器，base64 输出只含 ASCII 字符
+                image_bytes = output_path.read_bytes()
+                image_entry["image"] = base64.b64encode(image_bytes).decode("ascii")
+                image_size = len(image_bytes)
+            else:
+                image_size = output_path.stat().st_size
+            generated_images.append(image_entry)
             
-            try:
-                # 调用单图推理方法
-                img_bytes = self.infer_single.local(
-                    input_image_base64=image_base64,
-                    prompt=prompt,
-                    steps=steps,
-                    cfg=cfg_scale,
-                    seed=seed,
-                    output_prefix=f"qwen_{perspective_id}",
-                )
-                
-                # 将结果添加到列表
-                generated_images.append({
-                    "perspective_id": perspective_id,
-                    "perspective_name": perspective_name,
-                    "image": base64.b64encode(img_bytes).decode("utf-8"),
-                    "seed_used": seed if seed else "random",
-                })
-                
-                print(f"      ✅ 生成成功 ({len(img_bytes)} bytes)")
-                
-            except TimeoutError as e:
-                # Requirement 10.5: 超时错误
-                error_msg = f"视角 '{perspective_name}' 的生成超时"
-                logger.error(f"Generation timeout for {perspective_name}: {e}")
-                print(f"      ❌ {error_msg}")
-                return JSONResponse(
-                    status_code=504,
-                    content={
-                        "error": "timeout",
-                        "message": error_msg
-                    }
-                )
-            except RuntimeError as e:
-                # Requirement 10.2: 生成失败
-                error_msg = f"视角 '{perspective_name}' 的图像生成失败: {str(e)}"
-                logger.error(f"Generation failed for {perspective_name}: {e}")
-                print(f"      ❌ {error_msg}")
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": "generation_error",
-                        "message": error_msg
-                    }
-                )
-            except Exception as e:
-                # 其他未知错误
-                error_msg = f"视角 '{perspective_name}' 生成时发生未知错误: {str(e)}"
-                logger.error(f"Unknown error for {perspective_name}: {e}")
-                print(f"      ❌ {error_msg}")
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": "generation_error",
-                        "message": error_msg
-                    }
-                )
+            print(f"      ✅ {perspective_name} 生成成功 ({image_size} bytes)")
         
         # ====================================================================
         # 3. 返回结果 (Requirement 4.9)
@@ -948,17 +1665,49 @@ class ComfyUI:
         print(f"   - 总耗时: {total_time:.2f} 秒")
         print("=" * 60)
         
+        cors_headers = {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "POST, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type",
+        }
+        
+        if response_format == "multipart":
+            import orjson
+            
+            boundary = uuid.uuid4().hex
+            metadata = orjson.dumps(
+                {"images": generated_images, "total_time": round(total_time, 2)}
+            )
+            delimiter = f"--{boundary}\r\n".encode("ascii")
+            
+            def iter_multipart():
+                # 图片按 64KB 分块直接从 ComfyUI 输出目录读取，不在内存中拼接整个响应
+                yield delimiter + b"Content-Type: application/json; charset=utf-8\r\n\r\n" + metadata + b"\r\n"
+                for perspective_id, output_path in zip(perspective_ids, output_paths):
+                    # perspective_id 来自请求体：百分号编码后才能写入头部，
+                    # 否则其中的 CR/LF 或 <> 可以伪造头部和分隔符
+                    content_id = quote(str(perspective_id), safe="")
+                    headers = f"Content-Type: image/png\r\nContent-ID: <{content_id}>\r\n\r\n"
+                    yield delimiter + headers.encode("utf-8")
+                    with open(output_path, "rb") as f:
+                        while chunk := f.read(65536):
+                            yield chunk
+                    yield b"\r\n"
+                yield f"--{boundary}--\r\n".encode("ascii")
+            
+            return StreamingResponse(
+                iter_multipart(),
+                media_type=f"multipart/mixed; boundary={boundary}",
+                headers=cors_headers,
+            )
+        
         return JSONResponse(
             content={
                 "images": generated_images,
                 "total_time": round(total_time, 2),
                 "original_image": image_base64,
             },
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "POST, OPTIONS",
-                "Access-Control-Allow-Headers": "Content-Type",
-            }
+            headers=cors_headers,
         )
 
 
@@ -970,8 +1719,10 @@ class ComfyUI:
 def main():
     """本地测试入口"""
     print("Modal app 'qwen-image-edit' is configured.")
-    print(f"GPU: L40S")
-    print(f"Scaledown window: 300 seconds")
+    print(f"GPU: {GPU_TYPE}")
+    print(f"Scaledown window: {SCALEDOWN_WINDOW} seconds")
+    print(f"Min containers: {MIN_CONTAINERS}")
+    print(f"Max concurrent inputs per container: {MAX_CONCURRENT_INPUTS}")
     print(f"Volume: qwen-models mounted at /cache")
 
 
@@ -996,11 +1747,12 @@ def download_models_to_volume():
     - 5.6: 支持 qwen_image_vae, qwen_2.5_vl_7b, Qwen-Image-Edit-2511
     - 5.7: 支持 Lightning LoRA 权重
     """
-    download_models()
+    files = download_models()
     
-    # 提交卷更改
+    # 整批下载完成后只提交一次卷更改
     vol.commit()
-    print("✅ 模型已保存到 Modal Volume")
+    total_gb = sum(files.values()) / 1024 ** 3
+    print(f"✅ 模型已保存到 Modal Volume ({len(files)} 个文件, {total_gb:.1f} GB)")
 
 
 @app.function(
@@ -1024,10 +1776,20 @@ def verify_models_in_volume():
     all_exist = True
     for model_type, model_files in MODELS.items():
         print(f"\n📁 {model_type}:")
+        # 每个目录只扫描一次，同时拿到存在性和文件大小
+        wanted = set(model_files)
+        try:
+            with os.scandir(cache_dir / model_type) as entries:
+                present = {
+                    entry.name: entry.stat().st_size
+                    for entry in entries
+                    if entry.name in wanted and entry.is_file()
+                }
+        except FileNotFoundError:
+            present = {}
         for model_file in model_files:
-            file_path = cache_dir / model_type / model_file
-            if file_path.exists():
-                size_mb = file_path.stat().st_size / (1024 * 1024)
+            if model_file in present:
+                size_mb = present[model_file] / (1024 * 1024)
                 print(f"   ✅ {model_file} ({size_mb:.1f} MB)")
             else:
                 print(f"   ❌ {model_file} (不存在)")
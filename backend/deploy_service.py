@@ -3,7 +3,6 @@ Deploy ComfyUI service to Modal without CLI encoding issues
 """
 import sys
 import os
-import subprocess
 
 # Set UTF-8 encoding for stdout
 if sys.platform == 'win32':
@@ -11,21 +10,31 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-# Change to project directory
-os.chdir(r'f:\1\comfyui')
+# Change to backend directory and make comfyui_modal importable
+backend_dir = r'f:\1\comfyui\backend'
+os.chdir(backend_dir)
+sys.path.insert(0, backend_dir)
 
 print("=" * 60)
 print("Deploying ComfyUI service to Modal...")
 print("=" * 60)
 
-# Run modal deploy command
-result = subprocess.run(
-    [sys.executable, "-m", "modal", "deploy", "backend/comfyui_modal.py"],
-    capture_output=False,
-    text=True
-)
+# Load the app and deploy it in-process instead of spawning the modal CLI
+returncode = 0
+try:
+    import modal
 
-if result.returncode == 0:
+    # A regular import registers comfyui_modal in sys.modules, as the modal CLI does
+    from comfyui_modal import app
+
+    # Show image build and deploy logs like `modal deploy` does
+    with modal.enable_output():
+        app.deploy()
+except Exception as e:
+    print(f"\nError during deployment: {e}")
+    returncode = 1
+
+if returncode == 0:
     print("\n" + "=" * 60)
     print("SUCCESS: ComfyUI service deployed!")
     print("=" * 60)
@@ -40,4 +49,4 @@ else:
     print("Check Modal web console for details")
     print("=" * 60)
 
-sys.exit(result.returncode)
+sys.exit(returncode)
@@ -6,12 +6,23 @@ import modal
 app = modal.App("download-vae")
 vol = modal.Volume.from_name("qwen-models")
 
-image = modal.Image.debian_slim(python_version="3.11").pip_install("huggingface_hub")
+image = (
+    modal.Image.debian_slim(python_version="3.11")
+    .pip_install("huggingface_hub>=0.23.0", "hf_transfer")
+    # Multi-connection Rust downloader for the large safetensors files;
+    # progress bars are off because Modal captures stdout line by line
+    .env({
+        "HF_HUB_ENABLE_HF_TRANSFER": "1",
+        "HF_HUB_DOWNLOAD_TIMEOUT": "60",
+        "HF_HUB_DISABLE_PROGRESS_BARS": "1",
+    })
+)
 
 @app.function(image=image, volumes={"/cache": vol}, timeout=1800)
 def download_vae():
     from huggingface_hub import hf_hub_download
     from pathlib import Path
+    import os
     import shutil
 
     cache_dir = Path("/cache/models")
@@ -30,7 +41,6 @@ def download_vae():
             repo_id="Comfy-Org/Qwen-Image_ComfyUI",
             filename="split_files/vae/qwen_image_vae.safetensors",
             local_dir=str(target_dir),
-            local_dir_use_symlinks=False,
         )
 
         print(f"Downloaded to: {downloaded_path}")
@@ -39,20 +49,15 @@ def download_vae():
         target_path = target_dir / "qwen_image_vae.safetensors"
         downloaded_path = Path(downloaded_path)
 
-        if downloaded_path.name != "qwen_image_vae.safetensors":
+        if downloaded_path != target_path:
             print(f"Renaming {downloaded_path} to {target_path}")
-            shutil.move(str(downloaded_path), str(target_path))
-
-            # Clean up empty directories
-            try:
-                for parent in downloaded_path.parents:
-                    if parent == target_dir:
-                        break
-                    if parent.exists() and not any(parent.iterdir()):
-                        parent.rmdir()
-                        print(f"Removed empty dir: {parent}")
-            except OSError as e:
-                print(f"Warning: Could not clean up directories: {e}")
+            # Same directory tree, so this is a rename rather than a copy
+            os.replace(downloaded_path, target_path)
+
+            # Drop the repo's subfolder tree (split_files/...) in one call
+            stale_root = target_dir / downloaded_path.relative_to(target_dir).parts[0]
+            if stale_root != target_path and stale_root.is_dir():
+                shutil.rmtree(stale_root, ignore_errors=True)
 
         # Verify file exists
         if target_path.exists():
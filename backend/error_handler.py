@@ -13,6 +13,7 @@ from enum import Enum
 from typing import Optional, Dict, Any
 from dataclasses import dataclass
 import logging
+import re
 import traceback
 
 # 配置日志
@@ -42,7 +43,7 @@ class ErrorCode(str, Enum):
     SERVICE_UNAVAILABLE = "service_unavailable"
 
 
-@dataclass
+@dataclass(slots=True)
 class AppError:
     """应用错误类"""
     code: ErrorCode
@@ -52,13 +53,17 @@ class AppError:
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
-        result = {
+        # 两种形状各用一个字典字面量构建，避免创建后再插入键
+        if self.details:
+            return {
+                "error": self.code.value,
+                "message": self.message,
+                "details": self.details,
+            }
+        return {
             "error": self.code.value,
             "message": self.message,
         }
-        if self.details:
-            result["details"] = self.details
-        return result
 
 
 # 预定义错误消息
@@ -104,6 +109,18 @@ ERROR_MESSAGES = {
     },
 }
 
+# 导入时预先展开为 (消息, 状态码) 元组，create_error 只需一次查找和解包
+_ERROR_TEMPLATES = {
+    code: (info["message"], info["status_code"])
+    for code, info in ERROR_MESSAGES.items()
+}
+_UNKNOWN_ERROR_TEMPLATE = ("未知错误", 500)
+
+# handle_exception 的运行时错误分类关键词；模型类关键词优先于服务器类，
+# 因此分成两个模式依次匹配，而不是合并成一个取最左匹配
+_MODEL_ERROR_PATTERN = re.compile(r"model|load")
+_SERVER_ERROR_PATTERN = re.compile(r"comfyui|server")
+
 
 def create_error(
     code: ErrorCode,
@@ -121,17 +138,8 @@ def create_error(
     Returns:
         AppError 实例
     """
-    error_info = ERROR_MESSAGES.get(code, {
-        "message": "未知错误",
-        "status_code": 500,
-    })
-    
-    return AppError(
-        code=code,
-        message=message or error_info["message"],
-        status_code=error_info["status_code"],
-        details=details,
-    )
+    default_message, status_code = _ERROR_TEMPLATES.get(code, _UNKNOWN_ERROR_TEMPLATE)
+    return AppError(code, message or default_message, status_code, details)
 
 
 def create_validation_error(message: str, details: Optional[str] = None) -> AppError:
@@ -185,7 +193,7 @@ def create_model_error(details: Optional[str] = None) -> AppError:
     Returns:
         AppError 实例
     """
-    logger.error(f"Model loading failed: {details}")
+    logger.error("Model loading failed: %s", details)
     return create_error(
         ErrorCode.MODEL_ERROR,
         "AI 模型加载失败，服务暂时不可用",
@@ -236,15 +244,14 @@ def log_error(error: Exception, context: Optional[str] = None) -> None:
         error: 异常对象
         context: 错误上下文描述
     """
-    error_message = str(error)
-    stack_trace = traceback.format_exc()
-    
     if context:
-        logger.error(f"[{context}] {error_message}")
+        logger.error("[%s] %s", context, error)
     else:
-        logger.error(error_message)
+        logger.error("%s", error)
     
-    logger.debug(f"Stack trace:\n{stack_trace}")
+    # 只有启用 DEBUG 时才格式化调用栈
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Stack trace:\n%s", traceback.format_exc())
 
 
 def handle_exception(
@@ -275,11 +282,11 @@ def handle_exception(
         error_message = str(error).lower()
         
         # 检查是否是模型相关错误
-        if "model" in error_message or "load" in error_message:
+        if _MODEL_ERROR_PATTERN.search(error_message):
             return create_model_error(str(error))
         
         # 检查是否是 ComfyUI 服务器错误
-        if "comfyui" in error_message or "server" in error_message:
+        if _SERVER_ERROR_PATTERN.search(error_message):
             return create_service_unavailable_error("ComfyUI 服务器未响应")
         
         # 其他运行时错误视为生成错误
@@ -11,12 +11,21 @@ Requirements:
 """
 
 import os
+import json
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
+# 安装了 hf_transfer 时使用 Rust 多连接下载器；必须在导入 huggingface_hub 之前设置
+if importlib.util.find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+os.environ.setdefault("HF_HUB_DOWNLOAD_TIMEOUT", "60")
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class ModelInfo:
     """模型信息"""
     name: str                    # 本地文件名
@@ -26,6 +35,10 @@ class ModelInfo:
     local_dir: str               # 本地目录类型 (vae, clip, unet, loras)
 
 
+# 并行下载时保证多行日志不会交错
+_print_lock = threading.Lock()
+
+
 # ============================================================================
 # 模型配置
 # ============================================================================
@@ -118,6 +131,7 @@ def download_model_with_hf_hub(
         下载后的文件路径
     """
     from huggingface_hub import hf_hub_download
+    from huggingface_hub.utils import LocalEntryNotFoundError
     
     # 目标目录
     target_dir = cache_dir / model.local_dir
@@ -126,40 +140,56 @@ def download_model_with_hf_hub(
     
     # 如果文件已存在且不强制下载，直接返回
     if target_path.exists() and not force_download:
-        print(f"✅ {model.name} 已存在于缓存")
+        with _print_lock:
+            print(f"✅ {model.name} 已存在于缓存")
         return target_path
     
-    print(f"📥 下载 {model.name}...")
-    print(f"   仓库: {model.repo_id}")
-    print(f"   文件: {model.subfolder}/{model.filename}" if model.subfolder else f"   文件: {model.filename}")
+    repo_filename = f"{model.subfolder}/{model.filename}" if model.subfolder else model.filename
+    
+    # local_dir 中已有完整下载（例如上次在重命名前中断）时直接复用，不访问 Hub
+    downloaded_path = None
+    if not force_download:
+        try:
+            downloaded_path = hf_hub_download(
+                repo_id=model.repo_id,
+                filename=repo_filename,
+                local_dir=str(target_dir),
+                local_files_only=True,
+            )
+        except LocalEntryNotFoundError:
+            downloaded_path = None
+    
+    if downloaded_path is None:
+        with _print_lock:
+            print(f"📥 下载 {model.name} ({model.repo_id}/{repo_filename})...")
     
     try:
         # 使用 hf_hub_download 下载
-        downloaded_path = hf_hub_download(
-            repo_id=model.repo_id,
-            filename=f"{model.subfolder}/{model.filename}" if model.subfolder else model.filename,
-            local_dir=str(target_dir),
-            local_dir_use_symlinks=False,
-            force_download=force_download,
-        )
+        if downloaded_path is None:
+            downloaded_path = hf_hub_download(
+                repo_id=model.repo_id,
+                filename=repo_filename,
+                local_dir=str(target_dir),
+                force_download=force_download,
+            )
         
-        # 如果下载的文件名与目标文件名不同，重命名
+        # 如果下载的文件路径与目标路径不同，在同一目录树内原子重命名（不复制数据）
         downloaded_path = Path(downloaded_path)
-        if downloaded_path.name != model.name:
-            # 移动文件到目标位置
-            import shutil
-            shutil.move(str(downloaded_path), str(target_path))
-            # 清理可能的空目录
-            try:
-                downloaded_path.parent.rmdir()
-            except OSError:
-                pass
+        if downloaded_path != target_path:
+            os.replace(downloaded_path, target_path)
+            # 按实际下载路径定位 HuggingFace 子目录树的根，一次性删除
+            stale_root = target_dir / downloaded_path.relative_to(target_dir).parts[0]
+            if stale_root != target_path and stale_root.is_dir():
+                import shutil
+                shutil.rmtree(stale_root, ignore_errors=True)
         
-        print(f"✅ {model.name} 下载完成")
+        with _print_lock:
+            print(f"✅ {model.name} 下载完成")
         return target_path
         
     except Exception as e:
-        print(f"❌ {model.name} 下载失败: {e}")
+        with _print_lock:
+            print(f"❌ {model.name} 下载失败: {e}")
         raise
 
 
@@ -168,7 +198,10 @@ def download_all_models(
     force_download: bool = False,
 ) -> Dict[str, Path]:
     """
-    下载所有模型
+    并行下载所有模型
+    
+    下载受网络 I/O 限制，各文件在线程池中同时下载。并发数可通过
+    环境变量 HF_PARALLEL_DOWNLOADING_WORKERS 调整，默认最多 8 个。
     
     Args:
         cache_dir: 缓存目录
@@ -184,12 +217,20 @@ def download_all_models(
     results = {}
     failed = []
     
-    for model in MODELS:
-        try:
-            path = download_model_with_hf_hub(model, cache_dir, force_download)
-            results[model.name] = path
-        except Exception as e:
-            failed.append((model.name, str(e)))
+    max_workers = int(
+        os.environ.get("HF_PARALLEL_DOWNLOADING_WORKERS", str(min(len(MODELS), 8)))
+    )
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(download_model_with_hf_hub, model, cache_dir, force_download): model
+            for model in MODELS
+        }
+        for future in as_completed(futures):
+            model = futures[future]
+            try:
+                results[model.name] = future.result()
+            except Exception as e:
+                failed.append((model.name, str(e)))
     
     print("\n" + "=" * 60)
     if failed:
@@ -213,11 +254,8 @@ def verify_models(cache_dir: Path) -> Dict[str, bool]:
     Returns:
         模型名称到存在状态的映射
     """
-    results = {}
-    for model in MODELS:
-        target_path = cache_dir / model.local_dir / model.name
-        results[model.name] = target_path.exists()
-    return results
+    present = _scan_model_dirs(cache_dir)
+    return {model.name: model.name in present[model.local_dir] for model in MODELS}
 
 
 def get_missing_models(cache_dir: Path) -> List[ModelInfo]:
@@ -230,12 +268,67 @@ def get_missing_models(cache_dir: Path) -> List[ModelInfo]:
     Returns:
         缺失的模型列表
     """
-    missing = []
-    for model in MODELS:
-        target_path = cache_dir / model.local_dir / model.name
-        if not target_path.exists():
-            missing.append(model)
-    return missing
+    present = _scan_model_dirs(cache_dir)
+    return [model for model in MODELS if model.name not in present[model.local_dir]]
+
+
+def check_model_files(cache_dir: Path) -> Dict[str, Dict[str, Tuple[Optional[int], Optional[int]]]]:
+    """
+    检查卷上每个模型文件的实际大小，并与下载清单比对
+    
+    每个模型目录只扫描一次。download_models 写入的 .manifest.json 只用来
+    比对大小，不能代替扫描：下载后被删除或截断的文件仍然会被发现。
+    
+    Args:
+        cache_dir: 缓存目录
+        
+    Returns:
+        本地目录类型 -> {文件名: (实际大小, 清单记录的大小)}；
+        文件不存在时实际大小为 None，清单中没有记录时清单大小为 None
+    """
+    try:
+        manifest = json.loads((cache_dir / ".manifest.json").read_text())["files"]
+    except (OSError, ValueError, KeyError, TypeError):
+        manifest = {}
+    
+    results: Dict[str, Dict[str, Tuple[Optional[int], Optional[int]]]] = {}
+    for local_dir in dict.fromkeys(model.local_dir for model in MODELS):
+        wanted = {model.name for model in MODELS if model.local_dir == local_dir}
+        try:
+            with os.scandir(cache_dir / local_dir) as entries:
+                sizes = {
+                    entry.name: entry.stat().st_size
+                    for entry in entries
+                    if entry.name in wanted and entry.is_file()
+                }
+        except FileNotFoundError:
+            sizes = {}
+        results[local_dir] = {
+            model.name: (sizes.get(model.name), manifest.get(f"{local_dir}/{model.name}"))
+            for model in MODELS
+            if model.local_dir == local_dir
+        }
+    return results
+
+
+def _scan_model_dirs(cache_dir: Path) -> Dict[str, set]:
+    """
+    每个模型目录只扫描一次，收集其中的文件名
+    
+    Args:
+        cache_dir: 缓存目录
+        
+    Returns:
+        本地目录类型到文件名集合的映射；目录不存在时为空集合
+    """
+    present = {}
+    for local_dir in {model.local_dir for model in MODELS}:
+        try:
+            with os.scandir(cache_dir / local_dir) as entries:
+                present[local_dir] = {entry.name for entry in entries if entry.is_file()}
+        except FileNotFoundError:
+            present[local_dir] = set()
+    return present
 
 
 # ============================================================================
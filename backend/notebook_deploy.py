@@ -22,23 +22,23 @@ image = (
     .pip_install(
         "torch==2.1.0",
         "torchvision==0.16.0",
-        "torchaudio==2.1.0",
         "comfy-cli",
         "fastapi",
         "uvicorn",
         "pydantic",
         "huggingface_hub",
+        "hf_transfer",
         "Pillow",
     )
+    # 使用 hf_transfer (Rust) 分段并行下载大文件
+    .env({"HF_HUB_ENABLE_HF_TRANSFER": "1", "HF_HUB_DOWNLOAD_TIMEOUT": "60"})
     .run_commands(
-        "comfy --skip-prompt install --nvidia",
-    )
-    .run_commands(
+        "comfy --skip-prompt install --nvidia && "
         "cd /root/comfy/ComfyUI/custom_nodes && "
-        "git clone https://github.com/lrzjason/Comfyui-QwenEditUtils && "
-        "git clone https://github.com/city96/ComfyUI-GGUF && "
-        "git clone https://github.com/ltdrdata/ComfyUI-Impact-Pack was-node-suite-comfyui && "
-        "git clone https://github.com/yolain/ComfyUI-Easy-Use",
+        "git clone --depth 1 --single-branch https://github.com/lrzjason/Comfyui-QwenEditUtils && "
+        "git clone --depth 1 --single-branch https://github.com/city96/ComfyUI-GGUF && "
+        "git clone --depth 1 --single-branch https://github.com/ltdrdata/ComfyUI-Impact-Pack was-node-suite-comfyui && "
+        "git clone --depth 1 --single-branch https://github.com/yolain/ComfyUI-Easy-Use",
     )
 )
 
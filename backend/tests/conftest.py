@@ -0,0 +1,17 @@
+"""
+Shared Hypothesis configuration for the backend property tests.
+
+The default "ci" profile keeps the boundary-only properties cheap and
+derandomized, so every run replays the same examples (Hypothesis then
+keeps no example database); the exact boundaries are pinned with
+@example on the tests themselves. Set HYPOTHESIS_PROFILE=thorough for
+randomized 100-example runs that record failures in .hypothesis/.
+"""
+
+import os
+
+from hypothesis import settings
+
+settings.register_profile("ci", max_examples=25, deadline=None, derandomize=True)
+settings.register_profile("thorough", max_examples=100, deadline=None)
+settings.load_profile(os.getenv("HYPOTHESIS_PROFILE", "ci"))
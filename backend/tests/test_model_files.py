@@ -0,0 +1,61 @@
+"""
+Tests for the model file check shared by the volume verification scripts
+
+Feature: ai-product-view-webapp
+Validates: Requirements 5.6, 5.7
+
+The download manifest must never stand in for the files themselves: a
+model deleted or truncated after the download has to be reported.
+"""
+
+import json
+
+import sys
+from pathlib import Path
+
+# Add backend to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.model_download import MODELS, check_model_files
+
+
+def _write_models(cache_dir: Path, size: int) -> None:
+    """Create every model file with the given size and a matching manifest."""
+    manifest = {}
+    for model in MODELS:
+        path = cache_dir / model.local_dir / model.name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"\0" * size)
+        manifest[f"{model.local_dir}/{model.name}"] = size
+    (cache_dir / ".manifest.json").write_text(json.dumps({"files": manifest}))
+
+
+def test_check_model_files_reports_every_model(tmp_path):
+    _write_models(tmp_path, 16)
+
+    results = check_model_files(tmp_path)
+
+    assert list(results) == ["vae", "clip", "unet", "loras"]
+    for model in MODELS:
+        assert results[model.local_dir][model.name] == (16, 16)
+
+
+def test_check_model_files_detects_deleted_and_truncated_files(tmp_path):
+    _write_models(tmp_path, 16)
+    deleted, truncated = MODELS[0], MODELS[2]
+    (tmp_path / deleted.local_dir / deleted.name).unlink()
+    (tmp_path / truncated.local_dir / truncated.name).write_bytes(b"\0" * 4)
+
+    results = check_model_files(tmp_path)
+
+    assert results[deleted.local_dir][deleted.name] == (None, 16), \
+        "A file deleted after the download must be reported missing despite the manifest"
+    assert results[truncated.local_dir][truncated.name] == (4, 16), \
+        "A truncated file must report its real size next to the manifest size"
+
+
+def test_check_model_files_without_manifest(tmp_path):
+    results = check_model_files(tmp_path)
+
+    for model in MODELS:
+        assert results[model.local_dir][model.name] == (None, None)
@@ -0,0 +1,115 @@
+"""
+Tests for the bf16 -> scaled fp8 UNet conversion
+
+Feature: ai-product-view-webapp
+Validates: Requirements 5.6
+
+_quantize_fp8 streams a safetensors file tensor by tensor. These tests
+build a small state dict with the Qwen-Image key layout and check that
+only the transformer block linears are quantized, that their scales
+round-trip, and that every other tensor is copied unchanged.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import sys
+
+# Add backend to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+# Only installed in the Modal image / deployment environment
+pytest.importorskip("modal")
+torch = pytest.importorskip("torch")
+pytest.importorskip("safetensors")
+
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
+
+from backend.comfyui_modal import _quantize_fp8
+
+# Transformer block linears: quantized
+_BLOCK_WEIGHTS = (
+    "transformer_blocks.0.attn.to_q.weight",
+    "transformer_blocks.0.img_mlp.net.2.weight",
+    "transformer_blocks.1.attn.to_k.weight",
+)
+# Input/output projections, norms and biases: kept as is
+_KEPT = (
+    "img_in.weight",
+    "proj_out.weight",
+    "transformer_blocks.0.attn.to_q.bias",
+    "transformer_blocks.1.attn.norm_q.weight",
+)
+
+
+@pytest.fixture
+def converted(tmp_path):
+    generator = torch.Generator().manual_seed(0)
+    state_dict = {
+        "img_in.weight": torch.randn(16, 8, generator=generator),
+        "proj_out.weight": torch.randn(8, 16, generator=generator),
+        "transformer_blocks.0.attn.to_q.weight": torch.randn(16, 16, generator=generator),
+        "transformer_blocks.0.attn.to_q.bias": torch.randn(16, generator=generator),
+        "transformer_blocks.0.img_mlp.net.2.weight": torch.randn(16, 32, generator=generator) * 100,
+        "transformer_blocks.1.attn.norm_q.weight": torch.randn(16, generator=generator),
+        # An all-zero weight must not produce a zero scale or NaNs
+        "transformer_blocks.1.attn.to_k.weight": torch.zeros(16, 16),
+    }
+    state_dict = {key: tensor.to(torch.bfloat16) for key, tensor in state_dict.items()}
+    src_path = tmp_path / "unet.bf16"
+    dst_path = tmp_path / "unet.safetensors"
+    save_file(state_dict, str(src_path), metadata={"format": "pt"})
+
+    _quantize_fp8(src_path, dst_path)
+
+    return state_dict, dst_path
+
+
+def test_quantize_fp8_only_quantizes_block_linears(converted):
+    original, dst_path = converted
+
+    result = load_file(str(dst_path))
+
+    for key in _BLOCK_WEIGHTS:
+        assert result[key].dtype == torch.float8_e4m3fn, f"{key} must be stored as fp8"
+        scale_key = key[: -len("weight")] + "scale_weight"
+        assert result[scale_key].dtype == torch.float32
+        assert result[scale_key].shape == (1,)
+    for key in _KEPT:
+        assert result[key].dtype == torch.bfloat16, f"{key} must keep its original dtype"
+        assert torch.equal(result[key], original[key]), f"{key} must be copied unchanged"
+    assert "scaled_fp8" in result, "ComfyUI needs the scaled_fp8 marker to pick scaled fp8 ops"
+    assert not dst_path.with_name(f"{dst_path.name}.part").exists()
+
+
+def test_quantize_fp8_scale_round_trip(converted):
+    original, dst_path = converted
+
+    result = load_file(str(dst_path))
+
+    fp8_max = torch.finfo(torch.float8_e4m3fn).max
+    for key in _BLOCK_WEIGHTS:
+        weight = original[key].float()
+        quantized = result[key].float()
+        scale = result[key[: -len("weight")] + "scale_weight"]
+        restored = quantized * scale
+
+        assert torch.isfinite(restored).all(), f"{key} must dequantize to finite values"
+        if weight.abs().max() == 0:
+            assert torch.equal(restored, weight)
+            continue
+        # The largest magnitude maps onto the top of the e4m3 range
+        assert quantized.abs().max() == fp8_max
+        # e4m3 keeps 3 mantissa bits: relative error <= 2**-4, plus the subnormal step
+        tolerance = weight.abs() * 2 ** -4 + scale * 2 ** -9
+        assert (restored - weight).abs().le(tolerance).all(), \
+            f"{key} must round-trip within fp8 precision"
+
+
+def test_quantize_fp8_keeps_metadata(converted):
+    _, dst_path = converted
+
+    with safe_open(str(dst_path), framework="pt", device="cpu") as f:
+        assert f.metadata() == {"format": "pt", "dtype": "fp8_e4m3"}
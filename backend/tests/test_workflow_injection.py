@@ -10,8 +10,7 @@ These tests verify that user-provided parameters are correctly injected
 into the ComfyUI workflow template.
 """
 
-import copy
-from hypothesis import given, settings, strategies as st
+from hypothesis import example, given, settings, strategies as st
 
 import sys
 from pathlib import Path
@@ -21,10 +20,23 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from backend.workflow_executor import (
     inject_workflow_parameters,
+    render_workflow_bytes,
+    create_workflow,
+    create_batch_workflow,
+    batch_node_id,
+    NODE_IDS,
     _inject_prompt,
     _inject_ksampler_params,
+    _clone_nodes,
+    _parse_seed,
+    validate_workflow_parameters,
+)
+from backend.workflow_template import (
+    LOADER_NODE_IDS,
+    get_workflow_template,
+    _shared_workflow_template,
+    WORKFLOW_TEMPLATE_BYTES,
 )
-from backend.workflow_template import get_workflow_template
 
 
 # ============================================================================
@@ -38,7 +50,6 @@ from backend.workflow_template import get_workflow_template
 # ============================================================================
 
 @given(prompt=st.text(min_size=0, max_size=1000))
-@settings(max_examples=100)
 def test_property_10_workflow_prompt_injection(prompt: str):
     """
     Property 10: Workflow prompt injection
@@ -49,11 +60,12 @@ def test_property_10_workflow_prompt_injection(prompt: str):
     Feature: ai-product-view-webapp, Property 10: Workflow prompt injection
     Validates: Requirements 6.3
     """
-    # Arrange: Get a fresh workflow template
-    workflow = get_workflow_template()
+    # Arrange: Use the shared read-only workflow template
+    workflow = _shared_workflow_template()
     
     # Act: Inject the prompt
-    result = _inject_prompt(copy.deepcopy(workflow), prompt)
+    result = _clone_nodes(workflow)
+    _inject_prompt(result, prompt)
     
     # Assert: The prompt is correctly injected into node 115
     assert "115" in result, "TextEncodeQwenImageEditPlus node (115) must exist"
@@ -64,7 +76,6 @@ def test_property_10_workflow_prompt_injection(prompt: str):
 
 
 @given(prompt=st.text(min_size=0, max_size=1000))
-@settings(max_examples=100)
 def test_property_10_full_workflow_prompt_injection(prompt: str):
     """
     Property 10: Workflow prompt injection (full workflow)
@@ -75,7 +86,7 @@ def test_property_10_full_workflow_prompt_injection(prompt: str):
     Validates: Requirements 6.3
     """
     # Arrange
-    workflow = get_workflow_template()
+    workflow = _shared_workflow_template()
     input_image = "test_image.png"
     
     # Act: Use the main injection function
@@ -108,7 +119,6 @@ def test_property_10_full_workflow_prompt_injection(prompt: str):
     cfg=st.floats(min_value=1.0, max_value=5.0, allow_nan=False, allow_infinity=False),
     seed=st.integers(min_value=0, max_value=2**63 - 1)
 )
-@settings(max_examples=100)
 def test_property_11_workflow_parameter_injection(steps: int, cfg: float, seed: int):
     """
     Property 11: Workflow parameter injection
@@ -119,11 +129,12 @@ def test_property_11_workflow_parameter_injection(steps: int, cfg: float, seed:
     Feature: ai-product-view-webapp, Property 11: Workflow parameter injection
     Validates: Requirements 6.4
     """
-    # Arrange: Get a fresh workflow template
-    workflow = get_workflow_template()
+    # Arrange: Use the shared read-only workflow template
+    workflow = _shared_workflow_template()
     
     # Act: Inject the KSampler parameters
-    result = _inject_ksampler_params(copy.deepcopy(workflow), steps, cfg, seed)
+    result = _clone_nodes(workflow)
+    _inject_ksampler_params(result, steps, cfg, seed)
     
     # Assert: All parameters are correctly injected into node 14 (KSampler)
     assert "14" in result, "KSampler node (14) must exist"
@@ -152,7 +163,6 @@ def test_property_11_workflow_parameter_injection(steps: int, cfg: float, seed:
     cfg=st.floats(min_value=1.0, max_value=5.0, allow_nan=False, allow_infinity=False),
     seed=st.integers(min_value=0, max_value=2**63 - 1)
 )
-@settings(max_examples=100)
 def test_property_11_full_workflow_parameter_injection(steps: int, cfg: float, seed: int):
     """
     Property 11: Workflow parameter injection (full workflow)
@@ -163,7 +173,7 @@ def test_property_11_full_workflow_parameter_injection(steps: int, cfg: float, s
     Validates: Requirements 6.4
     """
     # Arrange
-    workflow = get_workflow_template()
+    workflow = _shared_workflow_template()
     input_image = "test_image.png"
     prompt = "Next Scene：将镜头向左旋转45度"
     
@@ -193,7 +203,6 @@ def test_property_11_full_workflow_parameter_injection(steps: int, cfg: float, s
 # ============================================================================
 
 @given(prompt=st.text(alphabet=st.characters(blacklist_categories=('Cs',)), min_size=0, max_size=500))
-@settings(max_examples=100)
 def test_property_10_unicode_prompt_injection(prompt: str):
     """
     Property 10 (edge case): Unicode prompt injection
@@ -203,7 +212,7 @@ def test_property_10_unicode_prompt_injection(prompt: str):
     Feature: ai-product-view-webapp, Property 10: Workflow prompt injection
     Validates: Requirements 6.3
     """
-    workflow = get_workflow_template()
+    workflow = _shared_workflow_template()
     
     result = inject_workflow_parameters(
         workflow=workflow,
@@ -222,7 +231,6 @@ def test_property_10_unicode_prompt_injection(prompt: str):
     st.integers(min_value=0, max_value=2**63 - 1),
     st.just(None)
 ))
-@settings(max_examples=100)
 def test_property_11_seed_none_handling(seed):
     """
     Property 11 (edge case): Seed None handling
@@ -232,7 +240,7 @@ def test_property_11_seed_none_handling(seed):
     Feature: ai-product-view-webapp, Property 11: Workflow parameter injection
     Validates: Requirements 6.4
     """
-    workflow = get_workflow_template()
+    workflow = _shared_workflow_template()
     
     result = inject_workflow_parameters(
         workflow=workflow,
@@ -257,3 +265,257 @@ def test_property_11_seed_none_handling(seed):
         # If seed was None, a random seed should be generated (just verify it's valid)
         assert 0 <= ksampler_seed < 2**63, \
             f"Generated seed must be in valid range, got {ksampler_seed}"
+
+
+@given(seed=st.one_of(
+    st.text(max_size=20),
+    st.from_regex(r"[ +\-]?[0-9_]{1,8}[ \n]?", fullmatch=True),
+))
+@example(seed=" 42")
+@example(seed="+42")
+@example(seed="4_2")
+@example(seed="\u0664\u0662")  # Arabic-Indic digits: isdigit() but not ASCII
+@example(seed="42")
+def test_property_11_seed_validation_matches_injection(seed: str):
+    """
+    Property 11 (edge case): Seed strings are parsed the same way everywhere
+    
+    validate_workflow_parameters accepts a non-empty seed string exactly when
+    injection uses it as the KSampler seed instead of falling back to random.
+    
+    Feature: ai-product-view-webapp, Property 11: Workflow parameter injection
+    Validates: Requirements 6.4
+    """
+    is_valid, _ = validate_workflow_parameters(8, 3.0, seed)
+    parsed = _parse_seed(seed)
+    
+    assert is_valid == (seed == "" or parsed is not None), \
+        f"Validation and seed parsing disagree on {seed!r}"
+    if parsed is not None:
+        result = create_workflow("test.png", "test prompt", seed=seed)
+        assert result["14"]["inputs"]["seed"] == int(seed), \
+            f"A seed accepted by validation must be injected as is: {seed!r}"
+    if seed in (" 42", "+42", "4_2"):
+        assert not is_valid, f"{seed!r} is not a plain digit string"
+
+
+@given(
+    prompt=st.text(alphabet=st.characters(blacklist_categories=('Cs',)), min_size=0, max_size=500),
+    steps=st.integers(min_value=4, max_value=8),
+    cfg=st.floats(min_value=1.0, max_value=5.0, allow_nan=False, allow_infinity=False),
+    seed=st.integers(min_value=0, max_value=2**63 - 1)
+)
+@example(prompt="__CFG__", steps=4, cfg=1.0, seed=0)
+@settings(max_examples=100)
+def test_property_10_11_byte_rendering_matches_injection(prompt: str, steps: int, cfg: float, seed: int):
+    """
+    Property 10/11 (byte-level rendering): render_workflow_bytes equivalence
+    
+    Verifies that substituting placeholders directly in the template bytes
+    yields the same workflow as dict-based injection, even for prompts
+    containing quotes, backslashes or placeholder-like text.
+    
+    Feature: ai-product-view-webapp, Property 10: Workflow prompt injection
+    Validates: Requirements 6.3, 6.4
+    """
+    import json
+    
+    expected = inject_workflow_parameters(
+        workflow=_shared_workflow_template(),
+        input_image="test.png",
+        prompt=prompt,
+        steps=steps,
+        cfg=cfg,
+        seed=seed,
+    )
+    
+    rendered = render_workflow_bytes(
+        input_image="test.png",
+        prompt=prompt,
+        steps=steps,
+        cfg=cfg,
+        seed=seed,
+    )
+    
+    assert json.loads(rendered) == expected, \
+        "Byte-level rendering must produce the same workflow as dict injection"
+
+
+@given(
+    prompt=st.text(alphabet=st.characters(blacklist_categories=('Cs',)), min_size=0, max_size=100),
+    seed=st.integers(min_value=0, max_value=2**63 - 1)
+)
+def test_property_10_11_injection_leaves_shared_template_untouched(prompt: str, seed: int):
+    """
+    Property 10/11 (template sharing): Injection never mutates its input
+    
+    The injection tests share one cached template, so every call must copy
+    the nodes it writes to instead of modifying the template in place.
+    
+    Feature: ai-product-view-webapp, Property 10: Workflow prompt injection
+    Validates: Requirements 6.3, 6.4
+    """
+    inject_workflow_parameters(
+        workflow=_shared_workflow_template(),
+        input_image="test.png",
+        prompt=prompt,
+        steps=4,
+        cfg=1.0,
+        seed=seed,
+    )
+    
+    assert _shared_workflow_template() == get_workflow_template(), \
+        "Injection must not modify the shared workflow template"
+
+
+def test_property_10_11_mutating_result_leaves_later_workflows_untouched():
+    """
+    Property 10/11 (template sharing): Returned workflows are independent copies
+    
+    Editing any node of a returned workflow, including the ones injection does
+    not touch, must not leak into later single or batch workflows.
+    
+    Feature: ai-product-view-webapp, Property 10: Workflow prompt injection
+    Validates: Requirements 6.3, 6.4
+    """
+    import json
+    
+    expected = get_workflow_template()["39"]["inputs"]["megapixels"]
+    
+    workflow = create_workflow("a.png", "p")
+    workflow["39"]["inputs"]["megapixels"] = expected + 3
+    workflow["12"]["inputs"]["samples"][0] = "99"
+    
+    batch = create_batch_workflow("a.png", ["p", "q"])
+    batch["39"]["inputs"]["megapixels"] = expected + 3
+    
+    assert create_workflow("a.png", "p")["39"]["inputs"]["megapixels"] == expected
+    assert create_workflow("a.png", "p")["12"]["inputs"]["samples"] == ["14", 0]
+    assert create_batch_workflow("a.png", ["p"])["39"]["inputs"]["megapixels"] == expected
+    assert _shared_workflow_template() == get_workflow_template(), \
+        "Mutating a returned workflow must not modify the shared workflow template"
+    assert json.loads(WORKFLOW_TEMPLATE_BYTES) == get_workflow_template(), \
+        "The byte template and the dict template must keep describing the same graph"
+
+
+@given(
+    prompt=st.text(alphabet=st.characters(blacklist_categories=('Cs',)), min_size=0, max_size=100),
+    steps=st.integers(min_value=4, max_value=8),
+    cfg=st.floats(min_value=1.0, max_value=5.0, allow_nan=False, allow_infinity=False),
+    seed=st.integers(min_value=0, max_value=2**63 - 1)
+)
+def test_property_10_11_loader_nodes_stay_stable(prompt: str, steps: int, cfg: float, seed: int):
+    """
+    Property 10/11 (model cache): Loader nodes never change between requests
+    
+    ComfyUI only reuses loaded model weights when the loader nodes keep the
+    same IDs and inputs, so no injection path may touch them.
+    
+    Feature: ai-product-view-webapp, Property 10: Workflow prompt injection
+    Validates: Requirements 6.2, 6.3, 6.4
+    """
+    import json
+    
+    template = _shared_workflow_template()
+    params = dict(input_image="test.png", prompt=prompt, steps=steps, cfg=cfg, seed=seed)
+    workflows = (
+        inject_workflow_parameters(workflow=template, **params),
+        json.loads(render_workflow_bytes(**params)),
+        create_batch_workflow(
+            input_image="test.png",
+            prompts=[prompt, prompt],
+            steps=steps,
+            cfg=cfg,
+            seed=seed,
+            output_prefixes=["view_0", "view_1"],
+        ),
+    )
+    
+    for workflow in workflows:
+        for node_id in LOADER_NODE_IDS:
+            assert workflow[node_id] == template[node_id], \
+                f"Loader node {node_id} must be identical across requests"
+
+
+@given(prompts=st.lists(
+    st.text(alphabet=st.characters(blacklist_categories=('Cs',)), min_size=1, max_size=100),
+    min_size=1,
+    max_size=11,
+))
+def test_property_10_batch_workflow_prompt_injection(prompts):
+    """
+    Property 10 (batch): Each perspective branch receives its own prompt
+    
+    Verifies that a batch workflow keeps a single shared encoder path and
+    wires every prompt into its own sampler and SaveImage branch.
+    
+    Feature: ai-product-view-webapp, Property 10: Workflow prompt injection
+    Validates: Requirements 4.8, 6.3
+    """
+    prefixes = [f"qwen_{i}" for i in range(len(prompts))]
+    
+    workflow = create_batch_workflow(
+        input_image="test.png",
+        prompts=prompts,
+        steps=8,
+        cfg=3.0,
+        seed=42,
+        output_prefixes=prefixes,
+    )
+    
+    assert workflow[NODE_IDS["load_image"]]["inputs"]["image"] == "test.png"
+    assert NODE_IDS["ksampler"] not in workflow, "Template sampler must be replaced by branches"
+    
+    for index, (prompt, prefix) in enumerate(zip(prompts, prefixes)):
+        encode_id = batch_node_id(NODE_IDS["text_encode_positive"], index)
+        sampler_id = batch_node_id(NODE_IDS["ksampler"], index)
+        decode_id = batch_node_id(NODE_IDS["vae_decode"], index)
+        save = workflow[batch_node_id(NODE_IDS["save_image"], index)]["inputs"]
+        sampler = workflow[sampler_id]["inputs"]
+        
+        assert workflow[encode_id]["inputs"]["text"] == prompt
+        assert sampler["positive"] == [encode_id, 0]
+        assert sampler["latent_image"] == [NODE_IDS["vae_encode"], 0]
+        assert sampler["seed"] == 42
+        assert save["images"] == [decode_id, 0]
+        assert save["filename_prefix"] == prefix
+
+
+@given(num_views=st.integers(min_value=1, max_value=11))
+def test_property_10_batch_workflow_graph_is_valid(num_views: int):
+    """
+    Property 10 (batch): Every node link resolves and the graph is acyclic
+    
+    ComfyUI rejects a prompt whose inputs reference a missing node, so the
+    nodes removed and added by create_batch_workflow must leave a complete DAG.
+    
+    Feature: ai-product-view-webapp, Property 10: Workflow prompt injection
+    Validates: Requirements 4.8, 6.2
+    """
+    import graphlib
+    
+    workflow = create_batch_workflow(
+        input_image="test.png",
+        prompts=[f"view {i}" for i in range(num_views)],
+        steps=8,
+        cfg=3.0,
+        seed=42,
+        output_prefixes=[f"qwen_{i}" for i in range(num_views)],
+    )
+    
+    # Links are [node_id, output_index] pairs in a node's inputs
+    graph = {
+        node_id: {
+            value[0] for value in node["inputs"].values()
+            if isinstance(value, list) and len(value) == 2 and isinstance(value[0], str)
+        }
+        for node_id, node in workflow.items()
+    }
+    
+    for node_id, upstream in graph.items():
+        missing = upstream - workflow.keys()
+        assert not missing, f"Node {node_id} references missing nodes {missing}"
+    
+    # Raises graphlib.CycleError if the branches were wired into a loop
+    order = tuple(graphlib.TopologicalSorter(graph).static_order())
+    assert set(order) == set(workflow), "Every node must be reachable in the execution order"
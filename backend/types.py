@@ -4,8 +4,8 @@ AI 商品视角转换 Web 应用 - 类型定义
 定义后端 API 的请求和响应数据模型。
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, List, Literal, Optional
 
 
 class Perspective(BaseModel):
@@ -22,6 +22,29 @@ class GenerateRequest(BaseModel):
     steps: int = Field(default=8, ge=4, le=8, description="Generation steps (4-8)")
     cfg_scale: float = Field(default=3.0, ge=1.0, le=5.0, description="CFG scale (1.0-5.0)")
     seed: Optional[str] = Field(default=None, description="Random seed (optional)")
+    response_format: Literal["json", "multipart"] = Field(
+        default="json",
+        description="'json' returns base64 images; 'multipart' returns raw PNG parts",
+    )
+
+
+class GenerationParams(BaseModel):
+    """生成数值参数（/generate 端点与测试共用）
+    
+    范围与 GenerateRequest 相同；严格模式拒绝布尔值和数字字符串，
+    范围约束同时拒绝 NaN 和无穷大。
+    """
+    model_config = ConfigDict(strict=True)
+    
+    steps: Annotated[int, GenerateRequest.model_fields["steps"]]
+    cfg_scale: Annotated[float, GenerateRequest.model_fields["cfg_scale"]]
+
+
+# GenerationParams 校验失败时按字段返回的错误信息
+GENERATION_PARAM_MESSAGES = {
+    "steps": "steps must be an integer between 4 and 8",
+    "cfg_scale": "cfg_scale must be a number between 1.0 and 5.0",
+}
 
 
 class GeneratedImage(BaseModel):
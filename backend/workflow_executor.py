@@ -10,14 +10,15 @@ Requirements:
 - 6.6: 使用 VAEDecode 解码 latent 输出为图片
 """
 
-import copy
 import json
 import random
+import re
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 from .workflow_template import (
-    get_workflow_template,
+    _shared_workflow_template,
+    WORKFLOW_TEMPLATE_BYTES,
     INPUT_IMAGE_PLACEHOLDER,
     PROMPT_PLACEHOLDER,
     SEED_PLACEHOLDER,
@@ -34,6 +35,31 @@ from .workflow_template import (
 # 工作流参数注入
 # ============================================================================
 
+def _clone_nodes(workflow: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    复制工作流的每个节点及其 inputs 字典（节点连接列表也一并复制）
+    
+    比 copy.deepcopy 少走通用的复制机制；返回的工作流不与原工作流
+    共享任何可变对象，调用方修改它不会影响缓存的共享模板。
+    
+    Args:
+        workflow: 原工作流字典（不会被修改）
+    
+    Returns:
+        Dict[str, Any]: 新的工作流字典
+    """
+    return {
+        node_id: {
+            **node,
+            "inputs": {
+                name: list(value) if isinstance(value, list) else value
+                for name, value in node["inputs"].items()
+            },
+        }
+        for node_id, node in workflow.items()
+    }
+
+
 def inject_workflow_parameters(
     workflow: Dict[str, Any],
     input_image: str,
@@ -56,55 +82,149 @@ def inject_workflow_parameters(
         output_prefix: 输出文件前缀
     
     Returns:
-        Dict[str, Any]: 注入参数后的工作流字典
+        Dict[str, Any]: 注入参数后的独立工作流字典（不与 workflow 共享节点）
         
     Requirements:
         - 6.3: 注入用户提示词到 TextEncodeQwenImageEditPlus 节点
         - 6.4: 注入 KSampler 参数（steps, cfg, seed）
     """
-    # 深拷贝工作流，避免修改原始模板
-    result = copy.deepcopy(workflow)
+    # 逐节点复制，避免修改原始模板，又不必走 deepcopy 的通用机制
+    result = _clone_nodes(workflow)
     
     # 处理种子值
-    if seed is None:
-        seed_value = random.randint(0, 2**63 - 1)
-    elif isinstance(seed, str):
-        seed_value = int(seed) if seed.isdigit() else random.randint(0, 2**63 - 1)
-    else:
-        seed_value = seed
+    seed_value = _resolve_seed(seed)
     
     # 注入输入图片路径 (LoadImage 节点 - node 31)
-    result = _inject_input_image(result, input_image)
+    _inject_input_image(result, input_image)
     
     # 注入用户提示词 (TextEncodeQwenImageEditPlus 节点 - node 115)
-    result = _inject_prompt(result, prompt)
+    _inject_prompt(result, prompt)
     
     # 注入 KSampler 参数 (node 14)
-    result = _inject_ksampler_params(result, steps, cfg, seed_value)
+    _inject_ksampler_params(result, steps, cfg, seed_value)
     
     # 注入输出前缀 (SaveImage 节点 - node 80)
-    result = _inject_output_prefix(result, output_prefix)
+    _inject_output_prefix(result, output_prefix)
     
     return result
 
 
-def _inject_input_image(workflow: Dict[str, Any], input_image: str) -> Dict[str, Any]:
+# 模板字节串中带引号的占位符，例如 b'"__PROMPT__"'
+_PLACEHOLDER_PATTERN = re.compile(
+    b'"('
+    + b"|".join(
+        re.escape(placeholder.encode("utf-8"))
+        for placeholder in (
+            INPUT_IMAGE_PLACEHOLDER,
+            PROMPT_PLACEHOLDER,
+            SEED_PLACEHOLDER,
+            STEPS_PLACEHOLDER,
+            CFG_PLACEHOLDER,
+            OUTPUT_PREFIX_PLACEHOLDER,
+        )
+    )
+    + b')"'
+)
+
+
+# 随机种子位数：生成 [0, 2**63) 范围内的种子
+_SEED_BITS = 63
+
+
+def _parse_seed(seed: str) -> Optional[int]:
     """
-    注入输入图片路径到 LoadImage 节点
+    解析种子字符串（validate_workflow_parameters 与 _resolve_seed 共用）
+    
+    只接受 ASCII 十进制数字；int() 额外接受的空白、正负号和下划线形式
+    （例如 " 42"、"+42"、"4_2"）都视为无效。
+    
+    Args:
+        seed: 种子字符串
+    
+    Returns:
+        Optional[int]: 种子值，无效时为 None
+    """
+    # isascii() 直接读取字符串的 ASCII 标记，不需要遍历
+    if seed.isascii() and seed.isdigit():
+        return int(seed)
+    return None
+
+
+def _resolve_seed(seed: Optional[Union[int, str]]) -> int:
+    """
+    将用户提供的种子转换为整数
+    
+    Args:
+        seed: 随机种子（None 或非数字字符串表示随机）
+    
+    Returns:
+        int: 实际使用的种子值
+    """
+    if seed is None:
+        return random.getrandbits(_SEED_BITS)
+    if isinstance(seed, str):
+        # 非数字字符串使用随机种子
+        value = _parse_seed(seed)
+        return value if value is not None else random.getrandbits(_SEED_BITS)
+    return seed
+
+
+def render_workflow_bytes(
+    input_image: str,
+    prompt: str,
+    steps: int = DEFAULT_STEPS,
+    cfg: float = DEFAULT_CFG,
+    seed: Optional[Union[int, str]] = None,
+    output_prefix: str = DEFAULT_OUTPUT_PREFIX,
+) -> bytes:
+    """
+    直接在预编译的模板 JSON 字节串上替换占位符，生成可提交的工作流
+    
+    与 inject_workflow_parameters 结果等价，但不需要拷贝字典再重新序列化：
+    所有占位符（含引号）通过一次正则扫描替换，替换值经过 JSON 编码，
+    因此用户输入中的引号或占位符文本都不会破坏 JSON 结构。
     
     Args:
-        workflow: 工作流字典
         input_image: 输入图片文件名
+        prompt: 用户提示词
+        steps: 生成步数 (4-8)
+        cfg: CFG 强度 (1.0-5.0)
+        seed: 随机种子
+        output_prefix: 输出文件前缀
     
     Returns:
-        Dict[str, Any]: 更新后的工作流字典
+        bytes: UTF-8 编码的工作流 JSON
+    """
+    def _encode(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+    
+    values = {
+        INPUT_IMAGE_PLACEHOLDER.encode("utf-8"): _encode(input_image),
+        PROMPT_PLACEHOLDER.encode("utf-8"): _encode(prompt),
+        SEED_PLACEHOLDER.encode("utf-8"): str(_resolve_seed(seed)).encode("ascii"),
+        STEPS_PLACEHOLDER.encode("utf-8"): _encode(steps),
+        CFG_PLACEHOLDER.encode("utf-8"): _encode(cfg),
+        OUTPUT_PREFIX_PLACEHOLDER.encode("utf-8"): _encode(output_prefix),
+    }
+    # 单次扫描替换：已替换进去的用户输入不会再被当作占位符处理
+    return _PLACEHOLDER_PATTERN.sub(lambda m: values[m.group(1)], WORKFLOW_TEMPLATE_BYTES)
+
+
+# 以下 _inject_* 函数原地修改 workflow，由调用方负责在需要时先复制节点
+
+def _inject_input_image(workflow: Dict[str, Any], input_image: str) -> None:
+    """
+    注入输入图片路径到 LoadImage 节点
+    
+    Args:
+        workflow: 工作流字典
+        input_image: 输入图片文件名
     """
     if "31" in workflow:
         workflow["31"]["inputs"]["image"] = input_image
-    return workflow
 
 
-def _inject_prompt(workflow: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+def _inject_prompt(workflow: Dict[str, Any], prompt: str) -> None:
     """
     注入用户提示词到 TextEncodeQwenImageEditPlus 节点
     
@@ -113,13 +233,9 @@ def _inject_prompt(workflow: Dict[str, Any], prompt: str) -> Dict[str, Any]:
     Args:
         workflow: 工作流字典
         prompt: 用户提示词
-    
-    Returns:
-        Dict[str, Any]: 更新后的工作流字典
     """
     if "115" in workflow:
         workflow["115"]["inputs"]["text"] = prompt
-    return workflow
 
 
 def _inject_ksampler_params(
@@ -127,7 +243,7 @@ def _inject_ksampler_params(
     steps: int,
     cfg: float,
     seed: int,
-) -> Dict[str, Any]:
+) -> None:
     """
     注入 KSampler 参数
     
@@ -138,31 +254,23 @@ def _inject_ksampler_params(
         steps: 生成步数
         cfg: CFG 强度
         seed: 随机种子
-    
-    Returns:
-        Dict[str, Any]: 更新后的工作流字典
     """
     if "14" in workflow:
         workflow["14"]["inputs"]["steps"] = steps
         workflow["14"]["inputs"]["cfg"] = cfg
         workflow["14"]["inputs"]["seed"] = seed
-    return workflow
 
 
-def _inject_output_prefix(workflow: Dict[str, Any], output_prefix: str) -> Dict[str, Any]:
+def _inject_output_prefix(workflow: Dict[str, Any], output_prefix: str) -> None:
     """
     注入输出文件前缀到 SaveImage 节点
     
     Args:
         workflow: 工作流字典
         output_prefix: 输出文件前缀
-    
-    Returns:
-        Dict[str, Any]: 更新后的工作流字典
     """
     if "80" in workflow:
         workflow["80"]["inputs"]["filename_prefix"] = output_prefix
-    return workflow
 
 
 # ============================================================================
@@ -191,9 +299,9 @@ def create_workflow(
     Returns:
         Dict[str, Any]: 完整的工作流字典
     """
-    template = get_workflow_template()
+    # inject_workflow_parameters 返回独立副本，这里直接传入共享模板即可
     return inject_workflow_parameters(
-        workflow=template,
+        workflow=_shared_workflow_template(),
         input_image=input_image,
         prompt=prompt,
         steps=steps,
@@ -203,6 +311,94 @@ def create_workflow(
     )
 
 
+def batch_node_id(node_id: str, index: int) -> str:
+    """
+    获取批量工作流中第 index 个分支节点的 ID
+    
+    Args:
+        node_id: 模板中的节点 ID（例如 "80"）
+        index: 分支序号（从 0 开始）
+    
+    Returns:
+        str: 分支节点 ID（例如 "80_2"）
+    """
+    return f"{node_id}_{index}"
+
+
+def create_batch_workflow(
+    input_image: str,
+    prompts: List[str],
+    steps: int = DEFAULT_STEPS,
+    cfg: float = DEFAULT_CFG,
+    seed: Optional[Union[int, str]] = None,
+    output_prefixes: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    创建一次提交即可生成多个视角的工作流
+    
+    模型加载、图片缩放、VAE 编码和负向提示词编码只保留一份；
+    每个提示词拥有独立的正向编码、KSampler、VAEDecode 和 SaveImage 分支，
+    分支节点 ID 由 batch_node_id 生成。
+    
+    Args:
+        input_image: 输入图片文件名
+        prompts: 每个分支的提示词
+        steps: 生成步数 (4-8)
+        cfg: CFG 强度 (1.0-5.0)
+        seed: 随机种子（为空时每个分支各自随机）
+        output_prefixes: 每个分支的输出文件前缀，默认使用 DEFAULT_OUTPUT_PREFIX
+    
+    Returns:
+        Dict[str, Any]: 完整的工作流字典
+    
+    Raises:
+        ValueError: 当 prompts 为空或 output_prefixes 长度不匹配时
+    """
+    if not prompts:
+        raise ValueError("prompts must not be empty")
+    if output_prefixes is None:
+        output_prefixes = [DEFAULT_OUTPUT_PREFIX] * len(prompts)
+    if len(output_prefixes) != len(prompts):
+        raise ValueError("output_prefixes must have the same length as prompts")
+    
+    workflow = create_workflow(
+        input_image=input_image,
+        prompt=prompts[0],
+        steps=steps,
+        cfg=cfg,
+        seed=0,
+        output_prefix=output_prefixes[0],
+    )
+    
+    # 从共享部分中取出每个视角独立的节点，作为分支模板
+    branch_ids = (
+        NODE_IDS["text_encode_positive"],
+        NODE_IDS["ksampler"],
+        NODE_IDS["vae_decode"],
+        NODE_IDS["save_image"],
+    )
+    branch = {node_id: workflow.pop(node_id) for node_id in branch_ids}
+    
+    for index, (prompt, output_prefix) in enumerate(zip(prompts, output_prefixes)):
+        for node_id, node in branch.items():
+            # 分支内部的连接指向同一分支的节点，其余连接指向共享节点
+            inputs = {
+                name: (
+                    [batch_node_id(value[0], index), value[1]]
+                    if isinstance(value, list) and value[0] in branch
+                    else value
+                )
+                for name, value in node["inputs"].items()
+            }
+            workflow[batch_node_id(node_id, index)] = {**node, "inputs": inputs}
+        
+        workflow[batch_node_id(NODE_IDS["text_encode_positive"], index)]["inputs"]["text"] = prompt
+        workflow[batch_node_id(NODE_IDS["ksampler"], index)]["inputs"]["seed"] = _resolve_seed(seed)
+        workflow[batch_node_id(NODE_IDS["save_image"], index)]["inputs"]["filename_prefix"] = output_prefix
+    
+    return workflow
+
+
 def save_workflow_to_file(workflow: Dict[str, Any], filepath: Union[str, Path]) -> Path:
     """
     将工作流保存到 JSON 文件
@@ -233,8 +429,6 @@ def load_workflow_from_file(filepath: Union[str, Path]) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: 工作流字典
     """
-    filepath = Path(filepath)
-    
     with open(filepath, "r", encoding="utf-8") as f:
         return json.load(f)
 
@@ -259,18 +453,19 @@ def validate_workflow_parameters(
     Returns:
         tuple[bool, str]: (是否有效, 错误消息)
     """
+    # 与 GenerationParams 的严格模式一致：bool 虽是 int 的子类，也不接受
     # 验证 steps (4-8)
-    if not isinstance(steps, int) or steps < 4 or steps > 8:
+    if isinstance(steps, bool) or not (isinstance(steps, int) and 4 <= steps <= 8):
         return False, f"steps must be an integer between 4 and 8, got {steps}"
     
     # 验证 cfg (1.0-5.0)
-    if not isinstance(cfg, (int, float)) or cfg < 1.0 or cfg > 5.0:
+    if isinstance(cfg, bool) or not (isinstance(cfg, (int, float)) and 1.0 <= cfg <= 5.0):
         return False, f"cfg must be a number between 1.0 and 5.0, got {cfg}"
     
     # 验证 seed (可选，必须是数字字符串或整数)
     if seed is not None:
         if isinstance(seed, str):
-            if seed and not seed.isdigit():
+            if seed and _parse_seed(seed) is None:
                 return False, f"seed must be a numeric string, got '{seed}'"
         elif not isinstance(seed, int):
             return False, f"seed must be an integer or numeric string, got {type(seed).__name__}"
@@ -5,7 +5,7 @@ AI 商品视角转换 Web 应用 - ComfyUI 工作流模板
 
 工作流节点说明：
 - LoadImage (31): 加载用户上传的图片
-- ImageScaleToTotalPixels (39): 缩放图片到合适尺寸（1 megapixel）
+- ImageScaleToTotalPixels (39): 缩放图片到合适尺寸（1 megapixel，宽高取整到 64 的倍数）
 - VAELoader (22): 加载 qwen_image_vae.safetensors
 - CLIPLoader (76): 加载 qwen_2.5_vl_7b.safetensors
 - UNETLoader (77): 加载 Qwen-Image-Edit-2511.safetensors
@@ -25,6 +25,8 @@ Requirements:
 - 6.2: 配置所有必需的节点
 """
 
+import functools
+import json
 from typing import Any, Dict
 
 # ============================================================================
@@ -39,6 +41,11 @@ STEPS_PLACEHOLDER = "__STEPS__"
 CFG_PLACEHOLDER = "__CFG__"
 OUTPUT_PREFIX_PLACEHOLDER = "__OUTPUT_PREFIX__"
 
+# 缩放后的宽高取整到该值的倍数：约 1 百万像素的输入只会落在少数几种形状上
+# （1024x1024、1152x896、896x1152 等），相同形状的请求可以复用已选定的
+# cuDNN 算法和已编译的内核，宽高比偏差不超过一个取整步长
+RESOLUTION_STEPS = 64
+
 
 # ============================================================================
 # ComfyUI API 格式工作流模板
@@ -117,7 +124,7 @@ def get_workflow_template() -> Dict[str, Any]:
                 "image": ["31", 0],
                 "upscale_method": "lanczos",
                 "megapixels": 1,
-                "resolution_steps": 1
+                "resolution_steps": RESOLUTION_STEPS
             }
         },
         
@@ -131,6 +138,7 @@ def get_workflow_template() -> Dict[str, Any]:
         },
         
         # TextEncodeQwenImageEditPlus - 正向提示词编码（用户输入）
+        # 编码结果同时取决于输入图片 (image1/vae)，不能按视角离线预计算
         "115": {
             "class_type": "TextEncodeQwenImageEditPlus",
             "inputs": {
@@ -208,6 +216,35 @@ def get_workflow_template() -> Dict[str, Any]:
     }
 
 
+@functools.lru_cache(maxsize=1)
+def _shared_workflow_template() -> Dict[str, Any]:
+    """
+    获取进程内共享的工作流模板（只读）
+    
+    只构建一次，供不会修改模板的调用方使用（例如内部会先拷贝的
+    inject_workflow_parameters）。需要可修改副本时请调用
+    get_workflow_template()：重新构建字面量比拷贝缓存对象更快。
+    
+    Returns:
+        Dict[str, Any]: 共享的工作流模板字典，调用方不得修改
+    """
+    return get_workflow_template()
+
+
+# 预编译的模板 JSON 字节串（占位符保持原样）
+# 模块导入时序列化一次，提交工作流时无需每次重新构建并序列化整个字典
+WORKFLOW_TEMPLATE_BYTES: bytes = json.dumps(
+    _shared_workflow_template(), ensure_ascii=False, separators=(",", ":")
+).encode("utf-8")
+
+
+# 模型加载节点 ID（VAE、CLIP、UNET、4 步 LoRA、8 步 LoRA）
+# ComfyUI 按节点 ID 和输入缓存执行结果：这些节点在请求之间保持不变时，
+# 已加载的模型权重会被直接复用。它们的 ID 和输入属于稳定约定，参数注入
+# 和批量工作流都不得修改，否则每次请求都会重新从磁盘加载权重。
+LOADER_NODE_IDS = ("22", "76", "77", "125", "20")
+
+
 # ============================================================================
 # 默认参数值
 # ============================================================================